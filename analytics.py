@@ -0,0 +1,107 @@
+"""Vectorized aggregations over time entries for the Summary and Payments pages."""
+import pandas as pd
+import data_manager as dm
+
+ENTRY_COLUMNS = ["id", "userId", "userName", "date", "periodId", "duration"]
+TOTAL_COLUMNS = ["periodId", "userId", "userName", "hours", "entries"]
+
+_entries_frame = (None, None)
+
+def entries_frame():
+    """All entries as a DataFrame, rebuilt only when the cached entries change."""
+    global _entries_frame
+    entries = dm.get_entries()
+    source, frame = _entries_frame
+    if source is not entries:
+        # Column-wise construction is much cheaper than one record per row
+        frame = pd.DataFrame({
+            "id": [e['id'] for e in entries],
+            "userId": [e['userId'] for e in entries],
+            "userName": [e.get('userName', 'Unknown') for e in entries],
+            "date": [e['date'] for e in entries],
+            "periodId": [dm._entry_period_id(e) for e in entries],
+            "duration": [e['duration'] for e in entries],
+        }, columns=ENTRY_COLUMNS)
+        frame = frame.astype({"userId": "category", "periodId": "category"})
+        _entries_frame = (entries, frame)
+    return frame
+
+def period_totals(frame=None):
+    """Hours and entry count per (periodId, userId).
+
+    Reads the aggregates and closed-period snapshots by default; pass an
+    entries frame to recompute the totals from raw entries instead.
+    """
+    if frame is None:
+        totals = pd.DataFrame.from_records([dict(r) for r in dm.get_period_totals()], columns=TOTAL_COLUMNS)
+        # An empty table would otherwise come back with object columns
+        return totals.astype({"hours": float, "entries": int})
+
+    frame = frame.dropna(subset=["periodId"])
+    totals = frame.groupby(["periodId", "userId"], sort=False, observed=True).agg(
+        userName=("userName", "last"),
+        hours=("duration", "sum"),
+        entries=("duration", "size")
+    ).reset_index()
+    totals["hours"] = totals["hours"].round(2)
+    return totals.astype({"periodId": str, "userId": str})
+
+def _periods_frame():
+    periods = pd.DataFrame.from_records(
+        [(p['id'], p['label'], p['year'], p['periodNum']) for p in dm.get_periods()],
+        columns=["periodId", "label", "year", "num"]
+    )
+    return periods.drop_duplicates("periodId")
+
+def summary_frame(totals=None):
+    """Period totals with period details and per-user cumulative hours, latest period first."""
+    if totals is None:
+        totals = period_totals()
+
+    frame = totals.merge(_periods_frame(), on="periodId", how="inner")
+    # Running totals are accumulated earliest → latest
+    frame = frame.sort_values(["year", "num"], kind="stable")
+    frame["cumulative"] = frame.groupby("userId")["hours"].cumsum().round(2)
+    return frame.sort_values(["year", "num"], ascending=False, kind="stable").reset_index(drop=True)
+
+def role_rollup(period_id=None, totals=None):
+    """Hours, entry count and number of resources per role for each period."""
+    if totals is None:
+        totals = period_totals()
+    if period_id is not None:
+        totals = totals[totals["periodId"] == period_id]
+
+    roles = pd.DataFrame.from_records(
+        [(u['id'], u['role']) for u in dm.get_users()],
+        columns=["userId", "role"]
+    )
+    frame = totals.merge(roles, on="userId", how="left")
+    frame["role"] = frame["role"].fillna("Unknown")
+    rollup = frame.groupby(["periodId", "role"], sort=False).agg(
+        hours=("hours", "sum"),
+        entries=("entries", "sum"),
+        resources=("userId", "nunique")
+    ).reset_index()
+    rollup["hours"] = rollup["hours"].round(2)
+    return rollup
+
+def period_summary():
+    """Summary page data: one item per period with each user's period and cumulative hours."""
+    summary = {}
+    # Rows are already ordered latest period first, so one pass groups them
+    for row in summary_frame().itertuples(index=False):
+        item = summary.get(row.periodId)
+        if item is None:
+            item = summary[row.periodId] = {
+                "id": row.periodId,
+                "label": row.label,
+                "year": int(row.year),
+                "num": int(row.num),
+                "users": {}
+            }
+        item['users'][row.userId] = {
+            "name": row.userName or 'Unknown',
+            "total": float(row.hours),
+            "cumulative": float(row.cumulative)
+        }
+    return list(summary.values())
@@ -0,0 +1,324 @@
+"""Headless JSON HTTP API over data_manager for clock-in devices and payroll scripts.
+
+    python api.py [--host 127.0.0.1] [--port 8502]
+
+Machine clients skip Streamlit's per-session script reruns and talk to
+data_manager directly, through the same storage backend and settings as
+the app. Endpoints:
+
+    GET  /health                          backend and schema version (no token needed)
+    GET  /periods                         all periods, with a closed flag
+    GET  /periods/{id}/hours[?user=]      hours per resource for one period
+    GET  /periods/{id}/payments           payment records per resource for one period
+    GET  /entries?user=&start=&end=&offset=&limit=&order=
+                                          one page of entries and the total count
+    POST /entries   {"entries": [...]}    batched ingestion, same rows as the bulk import
+    POST /payments  {"payments": [...]}   batched payment status updates
+
+With TIMETRACKER_API_TOKEN set, every other request must send
+"Authorization: Bearer <token>". Without it the API only listens on
+localhost.
+"""
+import argparse
+import hmac
+import json
+import os
+import re
+import sys
+import traceback
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import MappingProxyType
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import data_manager as dm
+import metrics
+
+API_TOKEN = os.environ.get("TIMETRACKER_API_TOKEN", "")
+
+DEFAULT_PORT = 8502
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+# Most entries returned by one GET /entries
+MAX_PAGE_SIZE = 1000
+
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+class ApiError(Exception):
+    """Turned into a JSON {"error": message} response with the given status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# --- Parameters ---
+def _param(query, name):
+    values = query.get(name)
+    return values[-1] if values else None
+
+def _int_param(query, name, default, minimum, maximum):
+    value = _param(query, name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+    if not minimum <= number <= maximum:
+        raise ApiError(400, f"{name} must be between {minimum} and {maximum}")
+    return number
+
+def _date_param(query, name):
+    value = _param(query, name)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ApiError(400, f"{name} must be a YYYY-MM-DD date")
+
+def _user_param(query):
+    # A resource id or name, as in the export command
+    value = _param(query, "user")
+    if value is None:
+        return None
+    directory = dm.get_user_directory()
+    user = directory.get(value) or directory.by_name(value)
+    if user is None:
+        raise ApiError(404, f"unknown resource: {value}")
+    return user['id']
+
+def _period(period_id):
+    period = dm.get_period_calendar().get(period_id)
+    if period is None:
+        raise ApiError(404, f"unknown period: {period_id}")
+    return period
+
+def _records(body, key):
+    # The list under key in a JSON object body
+    records = body.get(key) if isinstance(body, dict) else None
+    if not isinstance(records, list):
+        raise ApiError(400, f"body must be a JSON object with a {key!r} list")
+    return records
+
+
+# --- Endpoints ---
+# Each takes (query, body, *path arguments) and returns (status, payload).
+def health(query, body):
+    return 200, {"status": "ok", "backend": dm.STORAGE_BACKEND, "schema": dm.SCHEMA_VERSION}
+
+def list_periods(query, body):
+    closed = dm.get_snapshots()
+    periods = sorted(dm.get_periods(), key=lambda p: p['startDate'])
+    return 200, {"periods": [{**p, "closed": p['id'] in closed} for p in periods]}
+
+def period_hours(query, body, period_id):
+    period = _period(period_id)
+    hours = dm.get_period_hours_by_user(period_id)
+    user_id = _user_param(query)
+    if user_id is not None:
+        hours = {user_id: hours.get(user_id, 0)}
+    return 200, {
+        "periodId": period_id,
+        "label": period['label'],
+        "closed": dm.is_period_closed(period_id),
+        "hours": hours
+    }
+
+def period_payments(query, body, period_id):
+    _period(period_id)
+    return 200, {"periodId": period_id, "payments": dm.get_payments_for_period(period_id)}
+
+def list_entries(query, body):
+    order = _param(query, "order") or "desc"
+    if order not in ("asc", "desc"):
+        raise ApiError(400, "order must be 'asc' or 'desc'")
+    user_id = _user_param(query)
+    start = _date_param(query, "start")
+    end = _date_param(query, "end")
+    offset = _int_param(query, "offset", 0, 0, sys.maxsize)
+    limit = _int_param(query, "limit", 50, 1, MAX_PAGE_SIZE)
+    return 200, {
+        "total": dm.count_entries(user_id, start, end),
+        "entries": dm.query_entries(user_id, start, end, offset=offset, limit=limit, order=order)
+    }
+
+def add_entries(query, body):
+    """Save a batch of entries. Rejected rows are reported by their index in the list."""
+    rows = _records(body, "entries")
+    report = dm.import_entries(row if isinstance(row, dict) else None for row in rows)
+    return 200, {
+        "imported": report['imported'],
+        "errors": [{"index": number - 1, "error": error} for number, error in report['errors']]
+    }
+
+def _payment_error(change, calendar, directory):
+    # Why one item of a POST /payments batch can't be saved, or None
+    if not isinstance(change, dict):
+        return "not a JSON object"
+    period_id, user_id, status, notes = (change.get(k) for k in ("periodId", "userId", "status", "notes"))
+    if not isinstance(period_id, str) or calendar.get(period_id) is None:
+        return f"unknown period {period_id!r}"
+    if not isinstance(user_id, str) or directory.get(user_id) is None:
+        return f"unknown resource {user_id!r}"
+    if not isinstance(status, str) or status not in dm.PAYMENT_STATUSES:
+        return f"status must be one of {', '.join(dm.PAYMENT_STATUSES)}"
+    if notes is not None and not isinstance(notes, str):
+        return "notes must be a string"
+    return None
+
+def update_payments(query, body):
+    """Set the status (and optionally notes) of a batch of periodId/userId payments, in one write."""
+    changes = _records(body, "payments")
+    calendar = dm.get_period_calendar()
+    directory = dm.get_user_directory()
+    valid = []
+    errors = []
+    for index, change in enumerate(changes):
+        error = _payment_error(change, calendar, directory)
+        if error is None:
+            valid.append((change['periodId'], change['userId'], change['status'], change.get('notes') or ""))
+        else:
+            errors.append({"index": index, "error": error})
+    if valid:
+        dm.save_payments(valid)
+    return 200, {"updated": len(valid), "errors": errors}
+
+
+# (method, path, endpoint); {name} matches one path segment
+ROUTES = [
+    ("GET", "/health", health),
+    ("GET", "/periods", list_periods),
+    ("GET", "/periods/{id}/hours", period_hours),
+    ("GET", "/periods/{id}/payments", period_payments),
+    ("GET", "/entries", list_entries),
+    ("POST", "/entries", add_entries),
+    ("POST", "/payments", update_payments),
+]
+
+_ROUTE_PATTERNS = [
+    (method, path, re.compile(re.sub(r"\{\w+\}", "([^/]+)", path)), endpoint)
+    for method, path, endpoint in ROUTES
+]
+
+def _route(method, path):
+    # Returns (route path, endpoint, path arguments)
+    allowed = []
+    for route_method, route_path, pattern, endpoint in _ROUTE_PATTERNS:
+        match = pattern.fullmatch(path)
+        if match is None:
+            continue
+        if route_method == method:
+            return route_path, endpoint, [unquote(arg) for arg in match.groups()]
+        allowed.append(route_method)
+    if allowed:
+        raise ApiError(405, f"{method} not allowed; use {', '.join(allowed)}")
+    raise ApiError(404, f"no such endpoint: {path}")
+
+def _jsonable(value):
+    # data_manager returns read-only views; tuples already encode as lists
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# --- Server ---
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "TimeTrackerAPI/1"
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        try:
+            route_path, endpoint, args = _route(method, url.path)
+            if endpoint is not health:
+                self._authorize()
+            body = self._read_body() if method == "POST" else None
+            # Timed per endpoint, like a page, when TIMETRACKER_METRICS is set
+            with metrics.run(f"API {method} {route_path}"):
+                status, payload = endpoint(parse_qs(url.query), body, *args)
+        except ApiError as e:
+            status, payload = e.status, {"error": str(e)}
+        except dm.PeriodClosedError as e:
+            status, payload = 409, {"error": str(e), "periodId": e.period_id}
+        except Exception:
+            traceback.print_exc()
+            status, payload = 500, {"error": "internal error"}
+        self._send(status, payload)
+
+    def _authorize(self):
+        if not API_TOKEN:
+            return
+        given = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(given.encode(), f"Bearer {API_TOKEN}".encode()):
+            raise ApiError(401, "missing or wrong bearer token")
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise ApiError(411, "Content-Length required")
+        if length < 0:
+            raise ApiError(400, "Content-Length must not be negative")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ApiError(400, "body is not valid JSON")
+
+    def _send(self, status, payload):
+        data = json.dumps(payload, default=_jsonable).encode()
+        # An unread request body would be taken for the next request
+        if status >= 400:
+            self.close_connection = True
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT):
+    """A threaded API server bound to host:port (port 0 picks a free one); call serve_forever()."""
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    if args.host not in LOCAL_HOSTS and not API_TOKEN:
+        parser.error("set TIMETRACKER_API_TOKEN before listening on a non-local address")
+
+    server = make_server(args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"TimeTracker API on http://{host}:{port} ({dm.STORAGE_BACKEND} storage)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        dm.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
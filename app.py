@@ -1,6 +1,7 @@
 """TimeTracker - Main Application Entry Point."""
 import streamlit as st
-from modules import time_entry, summary, resources, payments, periods
+import metrics
+import modules
 from pages import login
 
 # --- Configuration ---
@@ -32,7 +33,8 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 if not st.session_state.logged_in:
-    login.render()
+    with metrics.run("Login"):
+        login.render()
 else:
     # Add branding to header bar
     st.markdown(f"""
@@ -68,20 +70,37 @@ else:
     st.sidebar.divider()
     
     # Filter apps based on assignment
-    available_apps = st.session_state.assigned_apps
+    available_apps = [a for a in st.session_state.assigned_apps if a in modules.PAGES]
     if not available_apps:
         available_apps = ["Time Entry"] # Fallback
         
     page = st.sidebar.radio("Navigate", available_apps)
     
     # --- Route to Appropriate Page ---
-    if page == "Time Entry":
-        time_entry.render()
-    elif page == "Summary":
-        summary.render()
-    elif page == "Resource Management":
-        resources.render()
-    elif page == "Payments":
-        payments.render()
-    elif page == "Periods":
-        periods.render()
+    # The first visit to a page also pays for importing it
+    with metrics.run(page):
+        modules.load(page).render()
+    
+    # --- Data Metrics (admins only, TIMETRACKER_METRICS=1) ---
+    if metrics.ENABLED and st.session_state.role == "Admin":
+        last_run = metrics.last_run()
+        with st.sidebar.expander("Data Metrics"):
+            if last_run:
+                st.caption(
+                    f"This run ({last_run['page']}): {last_run['seconds'] * 1000:.0f} ms, "
+                    f"of which {last_run['data_seconds'] * 1000:.0f} ms in data_manager"
+                )
+                calls = sorted(last_run['calls'].items(), key=lambda item: item[1][1], reverse=True)
+                st.dataframe(
+                    [{"function": name, "calls": c, "ms": round(sec * 1000, 1), "KB": round(b / 1024, 1)} for name, (c, sec, b) in calls],
+                    hide_index=True
+                )
+            st.caption("Per page since start")
+            st.dataframe(
+                [
+                    {"page": name, "runs": t['runs'], "avg ms": round(t['seconds'] / t['runs'] * 1000, 1),
+                     "avg data ms": round(t['data_seconds'] / t['runs'] * 1000, 1)}
+                    for name, t in sorted(metrics.page_totals().items())
+                ],
+                hide_index=True
+            )
@@ -0,0 +1 @@
+"""Performance benchmarks for the TimeTracker data layer. Run from the repository root."""
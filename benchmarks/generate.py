@@ -0,0 +1,132 @@
+"""Seeded synthetic TimeTracker data: N resources over M years.
+
+    python -m benchmarks.generate --resources 50 --years 3 [--seed 1] [--out DIR]
+
+Writes users, periods, entries and payments to DIR/data (the current
+directory by default) through the configured storage backend, then
+rebuilds the aggregates. The same arguments always give the same data.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import data_manager as dm
+
+ROLES = ["MOA", "PA", "RPH", "AA"]
+
+
+def build_dataset(resources, years, seed=1, end_year=None):
+    """Return {"users", "periods", "entries", "payments", "snapshots"} records without writing anything."""
+    rng = random.Random(seed)
+    end_year = end_year or date.today().year
+    first_year = end_year - years + 1
+
+    users = [{
+        "id": "1600000000000",
+        "name": "Admin",
+        "role": "Admin",
+        "active": True,
+        "password": "admin",
+        "assigned_apps": dm.ALL_APPS
+    }]
+    for i in range(resources):
+        users.append({
+            "id": str(1600000000001 + i),
+            "name": f"Resource {i + 1:03d}",
+            "role": rng.choice(ROLES),
+            "active": rng.random() < 0.9,
+            "password": "",
+            "assigned_apps": ["Time Entry", "Summary"]
+        })
+    staff = users[1:]
+
+    periods = []
+    for year in range(first_year, end_year + 1):
+        periods.extend(dm.generate_default_periods(year))
+    calendar = dm.PeriodCalendar(periods)
+
+    # Weekdays only, with the odd day off; start times on the quarter hour
+    entries = []
+    next_id = 1700000000000
+    day = date(first_year, 1, 1)
+    while day.year <= end_year:
+        if day.weekday() < 5:
+            date_str = day.isoformat()
+            period = calendar.find(date_str)
+            for user in staff:
+                if rng.random() >= 0.85:
+                    continue
+                start = 7 * 60 + rng.randrange(13) * 15
+                end = start + rng.randrange(16, 41) * 15
+                start_time = f"{start // 60:02d}:{start % 60:02d}"
+                end_time = f"{end // 60:02d}:{end % 60:02d}"
+                entries.append({
+                    "id": str(next_id),
+                    "userId": user['id'],
+                    "userName": user['name'],
+                    "date": date_str,
+                    "startTime": start_time,
+                    "endTime": end_time,
+                    "duration": dm.calculate_duration(start_time, end_time),
+                    "periodId": period['id'] if period else None
+                })
+                next_id += 1
+        day += timedelta(days=1)
+
+    # Older periods are mostly settled; the two most recent are still open
+    payments = []
+    for period in periods[:-2]:
+        for user in staff:
+            roll = rng.random()
+            if roll < 0.8:
+                status, notes = "Paid", ""
+            elif roll < 0.9:
+                status, notes = "Processing", ""
+            elif roll < 0.95:
+                status, notes = "Issue", "Timesheet query"
+            else:
+                continue
+            updated = date.fromisoformat(period['endDate']) + timedelta(days=3)
+            payments.append({
+                "periodId": period['id'],
+                "userId": user['id'],
+                "status": status,
+                "notes": notes,
+                "updatedAt": f"{updated.isoformat()}T09:00:00"
+            })
+
+    return {"users": users, "periods": periods, "entries": entries, "payments": payments, "snapshots": []}
+
+
+def generate(resources, years, seed=1, end_year=None):
+    """Write a synthetic dataset to ./data with the configured backend. Returns record counts."""
+    dataset = build_dataset(resources, years, seed, end_year)
+    storage = dm._storage()
+    for name in dm.DATASETS:
+        storage.save(name, dataset[name])
+    dm.rebuild_aggregates()
+    return {name: len(records) for name, records in dataset.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resources", type=int, default=50)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--end-year", type=int, help="last year of data; defaults to this year")
+    parser.add_argument("--out", help="directory to write data/ into; defaults to the current directory")
+    args = parser.parse_args(argv)
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        os.chdir(args.out)
+    counts = generate(args.resources, args.years, args.seed, args.end_year)
+    for name, count in counts.items():
+        print(f"{name}: {count} records")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
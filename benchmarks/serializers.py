@@ -0,0 +1,119 @@
+"""Load and save times per data file codec on synthetic entries.
+
+    python -m benchmarks.serializers [--entries 100000] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import data_manager as dm
+
+CODECS = ["json", "orjson", "msgpack"]
+COMPRESSIONS = ["none", "gzip", "lzma"]
+
+
+def synthetic_entries(count, users=50, seed=1):
+    """Entries in the stored format, spread over users and days."""
+    rng = random.Random(seed)
+    first = date(2020, 1, 1)
+    entries = []
+    for i in range(count):
+        day = first + timedelta(days=i // users)
+        start = rng.randint(6, 10)
+        end = start + rng.randint(4, 9)
+        entries.append({
+            "id": str(1700000000000 + i),
+            "userId": str(1600000000000 + i % users),
+            "userName": f"Resource {i % users}",
+            "date": day.isoformat(),
+            "startTime": f"{start:02d}:00",
+            "endTime": f"{end:02d}:30",
+            "duration": end - start + 0.5,
+            "periodId": f"{day.year}-P{min(26, (day.timetuple().tm_yday - 1) // 14 + 1)}"
+        })
+    return entries
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def run(entry_count):
+    """Time a save and a load of the entries with every available codec and compression."""
+    entries = synthetic_entries(entry_count)
+    available = {"json": True, "orjson": dm.orjson is not None, "msgpack": dm.msgpack is not None}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "entries.json")
+        for codec in CODECS:
+            if not available[codec]:
+                continue
+            for compression in COMPRESSIONS:
+                def save():
+                    with open(path, 'wb') as f:
+                        f.write(dm._encode(entries, codec, compression))
+
+                def load():
+                    with open(path, 'rb') as f:
+                        return dm._decode(f.read())
+
+                _, save_seconds = _timed(save)
+                loaded, load_seconds = _timed(load)
+                assert loaded == entries, f"{codec}/{compression} did not round-trip"
+                results.append({
+                    "codec": codec,
+                    "compression": compression,
+                    "entries": entry_count,
+                    "bytes": os.path.getsize(path),
+                    "save_seconds": round(save_seconds, 4),
+                    "load_seconds": round(load_seconds, 4)
+                })
+
+        # The format written before pluggable codecs, for comparison
+        def save_legacy():
+            with open(path, 'w') as f:
+                json.dump(entries, f, indent=2)
+
+        def load_legacy():
+            with open(path, 'r') as f:
+                return json.load(f)
+
+        _, save_seconds = _timed(save_legacy)
+        _, load_seconds = _timed(load_legacy)
+        results.append({
+            "codec": "json (indent=2)",
+            "compression": "none",
+            "entries": entry_count,
+            "bytes": os.path.getsize(path),
+            "save_seconds": round(save_seconds, 4),
+            "load_seconds": round(load_seconds, 4)
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000, help="number of synthetic entries")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.entries)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{'codec':<16} {'compression':<12} {'size MB':>8} {'save s':>8} {'load s':>8}")
+    for r in results:
+        print(f"{r['codec']:<16} {r['compression']:<12} {r['bytes'] / 1e6:>8.2f} {r['save_seconds']:>8.3f} {r['load_seconds']:>8.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Time the cold start: the login screen and each page's first import.
+
+    python -m benchmarks.startup [--repeat 5] [--output startup.json] [--baseline old.json]
+
+Every timing runs in a fresh interpreter, as a new Streamlit worker
+would. "login screen" is the whole of app.py up to the rendered login
+form (streamlit.testing's AppTest, against an empty data directory);
+"first open <page>" is importing that page once streamlit and
+data_manager are already loaded. Results use the same JSON layout as
+benchmarks.suite, so --baseline works the same way.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+import modules
+from benchmarks.suite import _git_commit, compare
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOGIN_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({os.path.join(ROOT, "app.py")!r}, default_timeout=120)
+at.run()
+seconds = time.perf_counter() - start
+assert not at.exception, at.exception
+print(json.dumps({{"seconds": seconds, "modules": len(sys.modules), "pandas": "pandas" in sys.modules}}))
+"""
+
+PAGE_SCRIPT = """
+import json, sys, time
+import streamlit, data_manager, metrics, modules
+start = time.perf_counter()
+modules.load({page!r})
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": len(sys.modules), "pandas": "pandas" in sys.modules}}))
+"""
+
+
+def _fresh(script, cwd):
+    """Run script in a new interpreter and return the JSON it prints last."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(repeat):
+    """Time the login screen and every page's first import. Returns the results document."""
+    cases = [("login screen", LOGIN_SCRIPT)]
+    cases += [(f"first open {page}", PAGE_SCRIPT.format(page=page)) for page in modules.PAGES]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, script in cases:
+            print(f"{name}...", file=sys.stderr)
+            runs = [_fresh(script, tmp) for _ in range(repeat)]
+            times = [r['seconds'] for r in runs]
+            results.append({
+                "benchmark": name,
+                "scale": "-",
+                "repeat": repeat,
+                "modules": runs[-1]['modules'],
+                "pandas_loaded": runs[-1]['pandas'],
+                "min_s": min(times),
+                "median_s": statistics.median(times),
+                "mean_s": statistics.fmean(times)
+            })
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "results": results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per case")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio reported as slower")
+    args = parser.parse_args(argv)
+
+    document = run(args.repeat)
+
+    print(f"\n{'benchmark':<36} {'median ms':>10} {'min ms':>10} {'modules':>8} {'pandas':>7}", file=sys.stderr)
+    for r in document['results']:
+        print(f"{r['benchmark']:<36} {r['median_s'] * 1000:>10.1f} {r['min_s'] * 1000:>10.1f} {r['modules']:>8} {'yes' if r['pandas_loaded'] else 'no':>7}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    else:
+        print(json.dumps(document, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if compare(document, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
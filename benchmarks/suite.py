@@ -0,0 +1,253 @@
+"""Time data_manager calls and page aggregations at several data sizes.
+
+    python -m benchmarks.suite [--scales 10x1,50x3,100x5] [--repeat 5]
+                               [--output results.json] [--baseline old.json]
+
+Each scale is RESOURCESxYEARS of data from benchmarks.generate, written to
+a temporary directory with the configured storage backend. Results are
+JSON (stdout or --output) with a summary table on stderr; --baseline
+compares median times against an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import analytics
+import data_manager as dm
+from benchmarks.generate import generate
+
+DEFAULT_SCALES = "10x1,50x3,100x5"
+
+
+def _reset():
+    # Forget the previous scale's storage and caches
+    dm.flush()
+    dm._storage_backend = None
+    dm._read_cache.invalidate()
+    analytics._entries_frame = (None, None)
+
+
+def _cold():
+    dm._read_cache.invalidate()
+
+
+def _context(seed):
+    """Ids and dates the benchmarks pick from, fixed by the seed."""
+    rng = random.Random(seed)
+    users = [u['id'] for u in dm.get_users() if u['role'] != "Admin"]
+    periods = sorted(dm.get_periods(), key=lambda p: p['startDate'])
+    entries = dm.get_entries()
+    first = date.fromisoformat(periods[0]['startDate'])
+    last = date.fromisoformat(periods[-1]['endDate'])
+    # The generator only writes weekdays, so weekend days are free for new entries
+    weekends = [first + timedelta(days=d) for d in range((last - first).days) if (first + timedelta(days=d)).weekday() >= 5]
+    return {
+        "users": users,
+        "entries": len(entries),
+        "period": periods[-3]['id'],
+        "dates": [(first + timedelta(days=rng.randrange((last - first).days))).isoformat() for _ in range(1000)],
+        "free_dates": [d.isoformat() for d in reversed(weekends)]
+    }
+
+
+def payments_page(period_id):
+    """The data access behind the per-user loop in modules/payments.render."""
+    analytics.role_rollup(period_id)
+    users = dm.get_users()
+    period_hours = dm.get_period_hours_by_user(period_id)
+    period_payments = dm.get_payments_for_period(period_id)
+    rows = []
+    for user in users:
+        payment = period_payments.get(user['id'])
+        rows.append((user['name'], period_hours.get(user['id'], 0), payment['status'] if payment else "Pending"))
+    return rows
+
+
+def time_entry_page():
+    """The first page of Recent Entries in modules/time_entry.render."""
+    total = dm.count_entries()
+    return total, dm.query_entries(offset=0, limit=25, order="desc")
+
+
+def _log_day(user_id, date_str):
+    dm.save_entry({
+        "userId": user_id,
+        "userName": "Benchmark",
+        "date": date_str,
+        "startTime": "09:00",
+        "endTime": "17:00"
+    })
+
+
+def _save_entry(ctx, i):
+    _log_day(ctx['users'][i % len(ctx['users'])], ctx['free_dates'][i // len(ctx['users'])])
+
+
+def _save_entry_burst(ctx, i):
+    """Eight sessions logging time at the same moment, on the oldest free days."""
+    threads = [
+        threading.Thread(target=_log_day, args=(user_id, ctx['free_dates'][-1 - i]))
+        for user_id in ctx['users'][:8]
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def _save_payment(ctx, i):
+    dm.save_payment(ctx["period"], ctx['users'][i % len(ctx['users'])], "Processing", "Benchmark")
+
+
+# (name, calls per timing, setup before each timing, call(ctx, i)). Writes run last.
+BENCHMARKS = [
+    ("get_period_for_date", 1000, None, lambda ctx, i: dm.get_period_for_date(ctx['dates'][i % 1000])),
+    ("get_period_user_hours", 10, None, lambda ctx, i: dm.get_period_user_hours(ctx["period"], ctx['users'][i % len(ctx['users'])])),
+    ("get_period_user_hours (cold)", 1, _cold, lambda ctx, i: dm.get_period_user_hours(ctx["period"], ctx['users'][i % len(ctx['users'])])),
+    ("summary.period_summary", 1, None, lambda ctx, i: analytics.period_summary()),
+    ("summary.period_summary (cold)", 1, _cold, lambda ctx, i: analytics.period_summary()),
+    ("payments.render data", 1, None, lambda ctx, i: payments_page(ctx["period"])),
+    ("payments.render data (cold)", 1, _cold, lambda ctx, i: payments_page(ctx["period"])),
+    ("time_entry.render recent entries", 1, None, lambda ctx, i: time_entry_page()),
+    ("save_entry", 1, None, _save_entry),
+    ("save_entry x8 threads", 1, None, _save_entry_burst),
+    ("save_payment", 1, None, _save_payment),
+]
+
+
+def run_scale(resources, years, repeat, seed=1):
+    """Generate one dataset in a temporary directory and time every benchmark on it."""
+    cwd = os.getcwd()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            _reset()
+            generate(resources, years, seed)
+            ctx = _context(seed)
+            for name, number, setup, call in BENCHMARKS:
+                times = []
+                for r in range(repeat):
+                    if setup:
+                        setup()
+                    start = time.perf_counter()
+                    for n in range(number):
+                        call(ctx, r * number + n)
+                    times.append((time.perf_counter() - start) / number)
+                results.append({
+                    "benchmark": name,
+                    "scale": f"{resources}x{years}",
+                    "resources": resources,
+                    "years": years,
+                    "entries": ctx['entries'],
+                    "repeat": repeat,
+                    "number": number,
+                    "min_s": min(times),
+                    "median_s": statistics.median(times),
+                    "mean_s": statistics.fmean(times)
+                })
+        finally:
+            _reset()
+            os.chdir(cwd)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales, repeat, seed=1):
+    """Run the suite. scales is a list of (resources, years). Returns the results document."""
+    results = []
+    for resources, years in scales:
+        print(f"scale {resources}x{years}...", file=sys.stderr)
+        results += run_scale(resources, years, repeat, seed)
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": dm.STORAGE_BACKEND,
+            "codec": dm.DATA_CODEC,
+            "compression": dm.DATA_COMPRESSION,
+            "write_behind": dm.WRITE_BEHIND,
+            "cache_check_interval": dm.CACHE_CHECK_INTERVAL,
+            "seed": seed
+        },
+        "results": results
+    }
+
+
+def compare(document, baseline, threshold):
+    """Print median ratios against a baseline document. Returns the keys that got slower than threshold."""
+    before = {(r['scale'], r['benchmark']): r['median_s'] for r in baseline['results']}
+    slower = []
+    print(f"\n{'benchmark':<36} {'scale':>8} {'baseline ms':>12} {'now ms':>10} {'ratio':>7}", file=sys.stderr)
+    for r in document['results']:
+        key = (r['scale'], r['benchmark'])
+        if key not in before:
+            continue
+        ratio = r['median_s'] / before[key] if before[key] else float("inf")
+        flag = "  slower" if ratio >= threshold else ""
+        if flag:
+            slower.append(key)
+        print(f"{r['benchmark']:<36} {r['scale']:>8} {before[key] * 1000:>12.3f} {r['median_s'] * 1000:>10.3f} {ratio:>6.2f}x{flag}", file=sys.stderr)
+    return slower
+
+
+def _parse_scales(text):
+    scales = []
+    for part in text.split(","):
+        resources, _, years = part.strip().partition("x")
+        scales.append((int(resources), int(years)))
+    return scales
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated RESOURCESxYEARS")
+    parser.add_argument("--repeat", type=int, default=5, help="timings per benchmark")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio reported as slower")
+    args = parser.parse_args(argv)
+
+    document = run(_parse_scales(args.scales), args.repeat, args.seed)
+
+    print(f"\n{'benchmark':<36} {'scale':>8} {'entries':>8} {'median ms':>10} {'min ms':>10}", file=sys.stderr)
+    for r in document['results']:
+        print(f"{r['benchmark']:<36} {r['scale']:>8} {r['entries']:>8} {r['median_s'] * 1000:>10.3f} {r['min_s'] * 1000:>10.3f}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    else:
+        print(json.dumps(document, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if compare(document, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,157 +1,2182 @@
+import atexit
+import csv
+import gzip
+import inspect
+import io
 import json
+import lzma
 import os
-from datetime import datetime, timedelta
+import re
+import secrets
+import sqlite3
+import sys
+import heapq
+import itertools
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, timedelta
+from types import MappingProxyType
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: locking falls back to this process only
+    fcntl = None
+
+# Optional faster codecs
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 DATA_DIR = "data"
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
 PERIODS_FILE = os.path.join(DATA_DIR, "periods.json")
 ENTRIES_FILE = os.path.join(DATA_DIR, "entries.json")
 PAYMENTS_FILE = os.path.join(DATA_DIR, "payments.json")
+AGGREGATES_FILE = os.path.join(DATA_DIR, "aggregates.json")
+SNAPSHOTS_FILE = os.path.join(DATA_DIR, "snapshots.json")
+SQLITE_FILE = os.path.join(DATA_DIR, "timetracker.db")
+ENTRIES_LOG_FILE = os.path.join(DATA_DIR, "entries.log.jsonl")
+ENTRIES_SHARD_DIR = os.path.join(DATA_DIR, "entries")
+VERSIONS_FILE = os.path.join(DATA_DIR, "versions.json")
+# Grows by a byte with every write, from any process (see _publish_change)
+GENERATION_FILE = os.path.join(DATA_DIR, "generation")
+META_FILE = os.path.join(DATA_DIR, "meta.json")
+# Held by every process for an entries write and what must stay in step with it
+ENTRIES_LOCK_FILE = os.path.join(DATA_DIR, "entries.write.lock")
+
+# Source-of-truth datasets; everything else (e.g. aggregates) can be rebuilt from them
+DATASETS = ("users", "periods", "entries", "payments", "snapshots")
+
+# Storage backend: "json" (one file per dataset), "journal" (json plus an
+# append-only entries log), "sharded" (json with one entries file per year)
+# or "sqlite"
+STORAGE_BACKEND = os.environ.get("TIMETRACKER_STORAGE", "json")
+
+# Journal mode folds the entries log into entries.json once it grows past this size
+JOURNAL_COMPACT_BYTES = int(os.environ.get("TIMETRACKER_JOURNAL_COMPACT_BYTES", 1024 * 1024))
+
+# Data file format: codec "json" (compact, stdlib), "orjson" (same JSON,
+# faster) or "msgpack" (binary), optionally framed with "gzip" or "lzma"
+# once the encoded file reaches COMPRESS_MIN_BYTES. Reads detect the
+# format from the file itself, so these can be changed at any time.
+DATA_CODEC = os.environ.get("TIMETRACKER_CODEC", "json")
+DATA_COMPRESSION = os.environ.get("TIMETRACKER_COMPRESSION", "none")
+COMPRESS_MIN_BYTES = int(os.environ.get("TIMETRACKER_COMPRESS_MIN_BYTES", 64 * 1024))
+
+# Rows committed per write by import_entries
+IMPORT_BATCH_SIZE = 5000
+
+# Write-behind: entry saves and payment/user updates are queued in this
+# process and committed by a background thread (see WriteBehindStorage)
+WRITE_BEHIND = os.environ.get("TIMETRACKER_WRITE_BEHIND", "") not in ("", "0")
+
+# Seconds the write-behind thread waits after a write is queued, so writes
+# arriving together are committed together
+WRITE_BEHIND_DELAY = 0.05
+
+# Seconds to wait for queued writes when the process exits
+WRITE_BEHIND_EXIT_TIMEOUT = 30
+
+# Seconds a process serves cached datasets before looking for writes by
+# other processes; 0 looks on every read. The process's own writes are
+# seen at once either way.
+CACHE_CHECK_INTERVAL = float(os.environ.get("TIMETRACKER_CACHE_CHECK_INTERVAL", 1))
+
+# The generation file is started afresh once it reaches this size
+GENERATION_MAX_BYTES = 64 * 1024
+
+class DuplicateEntryError(ValueError):
+    """Raised when a resource already has an entry on the given date."""
+
+    def __init__(self, user_id, date):
+        super().__init__(f"An entry already exists for user {user_id} on {date}")
+        self.user_id = user_id
+        self.date = date
+
+
+class PeriodClosedError(ValueError):
+    """Raised when a change would alter the hours of a closed period."""
+
+    def __init__(self, period_id):
+        super().__init__(f"Period {period_id} is closed; reopen it to change its entries")
+        self.period_id = period_id
+
+
+_last_id = 0
+_id_lock = threading.Lock()
+
+def _new_id():
+    # Millisecond timestamp, bumped when two records are created in the same
+    # millisecond, plus random bits so ids from other processes (or replicas
+    # in containers with the same pid) can't collide
+    global _last_id
+    with _id_lock:
+        _last_id = max(int(datetime.now().timestamp() * 1000), _last_id + 1)
+        return f"{_last_id}-{secrets.token_hex(4)}"
 
 def _ensure_data_dir():
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
+    # Processes starting together may all find it missing
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+# --- Serialization ---
+GZIP_MAGIC = b"\x1f\x8b"
+LZMA_MAGIC = b"\xfd7zXZ\x00"
+
+# Corrupt or truncated data files read as empty, as plain JSON always has
+_DECODE_ERRORS = (ValueError, EOFError, lzma.LZMAError, gzip.BadGzipFile)
+
+def _require(module, codec):
+    if module is None:
+        raise RuntimeError(f"The {codec} codec needs the {codec} package (pip install {codec})")
+
+def _encode(data, codec=None, compression=None):
+    """Serialize data to bytes with the configured (or given) codec and compression."""
+    codec = codec or DATA_CODEC
+    compression = compression or DATA_COMPRESSION
+    if codec == "json":
+        payload = json.dumps(data, separators=(",", ":")).encode('utf-8')
+    elif codec == "orjson":
+        _require(orjson, codec)
+        payload = orjson.dumps(data)
+    elif codec == "msgpack":
+        _require(msgpack, codec)
+        payload = msgpack.packb(data)
+    else:
+        raise ValueError(f"Unknown data codec: {codec}")
+
+    if compression == "none" or len(payload) < COMPRESS_MIN_BYTES:
+        return payload
+    if compression == "gzip":
+        return gzip.compress(payload, compresslevel=6)
+    if compression == "lzma":
+        # Higher presets are many times slower for little gain on this data
+        return lzma.compress(payload, preset=1)
+    raise ValueError(f"Unknown data compression: {compression}")
+
+def _is_msgpack(payload):
+    # JSON text starts with an ASCII character; msgpack maps and arrays don't
+    return bool(payload) and payload[0] >= 0x80
+
+def _decode(raw):
+    """Parse bytes written by _encode, whatever codec and compression were used."""
+    if raw.startswith(GZIP_MAGIC):
+        raw = gzip.decompress(raw)
+    elif raw.startswith(LZMA_MAGIC):
+        raw = lzma.decompress(raw)
+    if _is_msgpack(raw):
+        _require(msgpack, "msgpack")
+        return msgpack.unpackb(raw)
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 def _load_json(filepath, default=None):
     _ensure_data_dir()
     if not os.path.exists(filepath):
         return default if default is not None else []
     try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
+        with open(filepath, 'rb') as f:
+            return _decode(f.read())
+    except _DECODE_ERRORS:
         return default if default is not None else []
 
+_ARRAY_SEPARATOR = re.compile(r"[\s,]*")
+
+def _iter_json_array(filepath, chunk_size=1 << 16):
+    """Yield the items of an array data file one at a time without loading the whole file."""
+    if not os.path.exists(filepath):
+        return
+    with open(filepath, 'rb') as f:
+        magic = f.read(len(LZMA_MAGIC))
+    opener = gzip.open if magic.startswith(GZIP_MAGIC) else lzma.open if magic.startswith(LZMA_MAGIC) else open
+    with opener(filepath, 'rb') as f:
+        if _is_msgpack(f.peek(1)[:1]):
+            _require(msgpack, "msgpack")
+            unpacker = msgpack.Unpacker(f)
+            for _ in range(unpacker.read_array_header()):
+                yield unpacker.unpack()
+            return
+        yield from _iter_json_text(io.TextIOWrapper(f, encoding='utf-8'), filepath, chunk_size)
+
+def _iter_json_text(f, filepath, chunk_size):
+    # Incremental parse of a JSON array read from a text stream
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size).lstrip()
+    if not buf:
+        return
+    if not buf.startswith("["):
+        raise ValueError(f"{filepath} does not contain a JSON array")
+    pos = 1
+    while True:
+        pos = _ARRAY_SEPARATOR.match(buf, pos).end()
+        if buf.startswith("]", pos):
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # The item runs past the end of the buffer
+            more = f.read(chunk_size)
+            if not more:
+                raise
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield item
+        pos = end
+
 def _save_json(filepath, data):
+    """Atomically replace filepath with data and bump its version."""
+    with _file_lock(filepath):
+        _replace_json(filepath, data)
+    _data_changed(filepath)
+
+def _replace_json(filepath, data):
+    # _save_json for a caller already holding _file_lock(filepath)
+    _write_atomic(filepath, data)
+    _bump_version(filepath)
+
+def _write_atomic(filepath, data):
+    # Temp file + fsync + rename: readers see either the old or the new file, never half of one
+    _ensure_data_dir()
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_encode(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+@contextmanager
+def _file_lock(filepath):
+    """Exclusive advisory lock on filepath, shared by all threads and processes. Not re-entrant."""
     _ensure_data_dir()
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(filepath, threading.Lock())
+    # Reads under a write lock feed read-modify-writes, so they must be current
+    with thread_lock, _read_cache.exact():
+        if fcntl is None:
+            yield
+            return
+        with open(f"{filepath}.lock", 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+# --- Dataset versions ---
+# data/versions.json counts the saves of each data file, so a process can
+# tell whether another session or process saved it since it last looked.
+def _dataset_version(filepath):
+    return _load_json(VERSIONS_FILE, default={}).get(os.path.basename(filepath), 0)
+
+def _bump_version(filepath):
+    with _file_lock(VERSIONS_FILE):
+        versions = _load_json(VERSIONS_FILE, default={})
+        name = os.path.basename(filepath)
+        versions[name] = versions.get(name, 0) + 1
+        _write_atomic(VERSIONS_FILE, versions)
+
+def _file_version(filepath):
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
+        return 0
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+# --- Change signal ---
+# Every write, in any process, appends a byte to data/generation once the
+# new data can be read. A process whose cached generation is unchanged
+# knows nothing was written; otherwise it re-checks the version of each
+# cached dataset as it is next read and reloads only those that moved.
+def _publish_change():
+    _ensure_data_dir()
+    with open(GENERATION_FILE, 'ab') as f:
+        f.write(b".")
+        size = f.tell()
+    if size >= GENERATION_MAX_BYTES:
+        # A new inode is a change too, so readers can't miss a write here
+        tmp_path = f"{GENERATION_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        open(tmp_path, 'wb').close()
+        os.replace(tmp_path, GENERATION_FILE)
+    # Other keys derived from the changed data are re-checked by this process too
+    _read_cache.recheck()
+
+def _data_changed(key):
+    """Drop key from this process's read cache and signal other processes."""
+    _read_cache.invalidate(key)
+    _publish_change()
+
+def _data_seen(*keys):
+    # An update that changed nothing still read the current data, which may
+    # be newer than the cache; callers re-read right after, so drop the keys
+    for key in keys:
+        _read_cache.invalidate(key)
+    _read_cache.recheck()
+
+# --- Read cache ---
+def _freeze(value):
+    """Return a read-only copy of parsed JSON (dicts become mapping proxies, lists tuples)."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _thaw(value):
+    """Return a mutable deep copy of a frozen view, safe to modify and save."""
+    if isinstance(value, MappingProxyType):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class _ReadCache:
+    """Process-wide cache of parsed datasets shared by all Streamlit sessions.
+
+    Each entry is stored with the version it was loaded at (file stat or
+    database counter) and the generation (see _publish_change) it was last
+    checked at. While the generation stays the same the entry is served
+    without asking for its version; once it moves, the version is compared
+    and the entry reloaded only if it changed. The generation itself is
+    looked at no more than every CACHE_CHECK_INTERVAL seconds. Values are
+    frozen so callers cannot corrupt the shared copy.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._epochs = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        # (monotonic time looked at, generation file version)
+        self._signal = (None, None)
+        self._local = threading.local()
+
+    def _generation(self):
+        checked_at, generation = self._signal
+        now = time.monotonic()
+        if checked_at is None or now - checked_at >= CACHE_CHECK_INTERVAL:
+            generation = _file_version(GENERATION_FILE)
+            self._signal = (now, generation)
+        return generation
+
+    def recheck(self):
+        """Look at the generation again on the next read."""
+        self._signal = (None, None)
+
+    @contextmanager
+    def exact(self):
+        """Check the version of everything read in this thread inside the block."""
+        depth = getattr(self._local, "exact", 0)
+        self._local.exact = depth + 1
+        try:
+            yield
+        finally:
+            self._local.exact = depth
+
+    def get(self, key, version_of, loader):
+        """The cached value for key, loading it if version_of() has moved on since."""
+        exact = getattr(self._local, "exact", 0)
+        hit = self._items.get(key)
+        if hit is not None and not exact and hit[2] == self._generation():
+            return hit[1]
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        # One session parses while the others wait for its result
+        with key_lock:
+            # Taken before the version: a write in between just means another check later
+            generation = self._generation()
+            hit = self._items.get(key)
+            if hit is not None and not exact and hit[2] == generation:
+                return hit[1]
+            version = version_of()
+            epoch = self._epochs.get(key, 0)
+            if hit is not None and version is not None and hit[0] == version:
+                value = hit[1]
+            else:
+                value = _freeze(loader())
+            # Don't keep a value that a concurrent write invalidated mid-load
+            if version is not None and self._epochs.get(key, 0) == epoch:
+                self._items[key] = (version, value, generation)
+            return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            keys = list(self._items) if key is None else [key]
+            for k in keys:
+                self._epochs[k] = self._epochs.get(k, 0) + 1
+                self._items.pop(k, None)
+
+
+_read_cache = _ReadCache()
+
+def _entry_sort_key(entry):
+    return (entry['date'], entry['startTime'])
+
+class _SharedRLock:
+    """Re-entrant lock shared by the threads of this process and, through an
+    advisory lock on path, by other processes. Reads while holding it are
+    exact, as under _file_lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._held = None
+
+    def acquire(self, timeout=-1):
+        if not self._lock.acquire(timeout=timeout):
+            return False
+        if self._depth == 0:
+            try:
+                _ensure_data_dir()
+                f = open(self.path, 'a')
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+            exact = _read_cache.exact()
+            exact.__enter__()
+            self._held = (f, exact)
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            f, exact = self._held
+            self._held = None
+            exact.__exit__(None, None, None)
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            f.close()
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# Serializes check-then-write on entries, and the aggregate and snapshot
+# changes that go with it, between sessions and processes
+_entries_lock = _SharedRLock(ENTRIES_LOCK_FILE)
+_day_index = (None, None)
+
+def _entry_day_index(entries):
+    """Set of (userId, date) pairs for a cached entries view, rebuilt when it changes."""
+    global _day_index
+    source, index = _day_index
+    if source is not entries:
+        index = frozenset((e['userId'], e['date']) for e in entries)
+        _day_index = (entries, index)
+    return index
+
+def _split_duplicates(new_entries, existing_days):
+    """Split new entries into (rejected, accepted) on the one-entry-per-user-per-day rule."""
+    seen = set()
+    rejected, accepted = [], []
+    for e in new_entries:
+        key = (e['userId'], e['date'])
+        if key in existing_days or key in seen:
+            rejected.append(e)
+        else:
+            seen.add(key)
+            accepted.append(e)
+    return rejected, accepted
+
+def _filter_entries(entries, user_id, start_date, end_date, period_id=None):
+    for e in entries:
+        if user_id is not None and e['userId'] != user_id:
+            continue
+        if start_date is not None and e['date'] < start_date:
+            continue
+        if end_date is not None and e['date'] > end_date:
+            continue
+        if period_id is not None and _entry_period_id(e) != period_id:
+            continue
+        yield e
+
+def _rebucket(entries, resolve):
+    # Give entries whose period has changed the periodId from resolve(date), in place.
+    # Returns [(entry before, entry after)] for those that moved.
+    moved = []
+    for e in entries:
+        period_id = resolve(e['date'])
+        if period_id != _entry_period_id(e):
+            before = dict(e)
+            e.pop('period', None)
+            e['periodId'] = period_id
+            moved.append((before, e))
+    return moved
+
+def _sum_by_period_user(entries):
+    # Aggregate rows for the given entries; entries without a period are skipped
+    rows = {}
+    for e in entries:
+        period_id = _entry_period_id(e)
+        if not period_id:
+            continue
+        row = rows.setdefault((period_id, e['userId']), {
+            "periodId": period_id,
+            "userId": e['userId'],
+            "userName": e.get('userName', 'Unknown'),
+            "hours": 0,
+            "entries": 0
+        })
+        row['hours'] = round(row['hours'] + e['duration'], 2)
+        row['entries'] += 1
+    return list(rows.values())
+
+def _aggregate_deltas(entries, sign):
+    # Changes to the aggregates for adding (sign 1) or removing (-1) entries
+    return [
+        {
+            "periodId": _entry_period_id(e),
+            "userId": e['userId'],
+            "userName": e.get('userName', 'Unknown'),
+            "hours": sign * e['duration'],
+            "entries": sign
+        }
+        for e in entries if _entry_period_id(e)
+    ]
+
+def _apply_deltas(rows, deltas):
+    # Add deltas to a mutable list of aggregate rows. Rows left with no (or,
+    # for a moment, fewer than no) entries are kept so deltas commute.
+    index = {(r['periodId'], r['userId']): r for r in rows}
+    for d in deltas:
+        row = index.get((d['periodId'], d['userId']))
+        if row is None:
+            row = index[(d['periodId'], d['userId'])] = {
+                "periodId": d['periodId'],
+                "userId": d['userId'],
+                "userName": d['userName'],
+                "hours": 0,
+                "entries": 0
+            }
+            rows.append(row)
+        row['hours'] = round(row['hours'] + d['hours'], 2)
+        row['entries'] += d['entries']
+
+def _merge_user(user_id, changes):
+    # update() mutate function that merges changes into one user
+    def merge(users):
+        for user in users:
+            if user['id'] == user_id:
+                user.update(changes)
+                return user
+        return None
+    return merge
+
+def _entry_period_id(entry):
+    if 'periodId' in entry:
+        return entry['periodId']
+    # Entries saved before normalize_entries embed the whole period
+    period = entry.get('period')
+    return period['id'] if period else None
+
+# --- Storage backends ---
+class JsonStorage:
+    """Stores each dataset as a whole JSON file under DATA_DIR."""
+    name = "json"
+
+    files = {
+        "users": USERS_FILE,
+        "periods": PERIODS_FILE,
+        "entries": ENTRIES_FILE,
+        "payments": PAYMENTS_FILE,
+        "aggregates": AGGREGATES_FILE,
+        "snapshots": SNAPSHOTS_FILE,
+        "meta": META_FILE,
+    }
+
+    def load(self, dataset):
+        return _load_json(self.files[dataset])
+
+    def version(self, dataset):
+        return _file_version(self.files[dataset])
+
+    def read(self, dataset):
+        """Return a cached, read-only view of a dataset."""
+        return _read_cache.get(self.files[dataset], lambda: self.version(dataset), lambda: self.load(dataset))
+
+    def save(self, dataset, records):
+        _save_json(self.files[dataset], records)
+
+    def update(self, dataset, mutate):
+        """Read-modify-write a dataset under its file lock.
+
+        mutate receives a mutable copy of the records, changes it in place and
+        returns a result; returning None means nothing changed. Writers of the
+        dataset in any process wait their turn, so mutate sees the latest
+        records and its result is never lost. mutate must not write the
+        same dataset.
+        """
+        path = self.files[dataset]
+        with _file_lock(path):
+            # A fresh parse is cheaper than thawing the cached view
+            records = self.load(dataset)
+            result = mutate(records)
+            if result is not None:
+                _replace_json(path, records)
+        if result is None:
+            _data_seen(path)
+        else:
+            _data_changed(path)
+        return result
+
+    def entry_exists(self, user_id, date):
+        return (user_id, date) in _entry_day_index(self.read("entries"))
+
+    def add_entry(self, entry):
+        if self.add_entries([entry]):
+            raise DuplicateEntryError(entry['userId'], entry['date'])
+
+    def add_entries(self, new_entries):
+        """Insert entries in one write. Returns those rejected as duplicates of an existing (userId, date)."""
+        rejected = []
+
+        def add(entries):
+            rejected[:], accepted = _split_duplicates(new_entries, {(e['userId'], e['date']) for e in entries})
+            entries.extend(accepted)
+            return accepted or None
+
+        with _entries_lock:
+            accepted = self.update("entries", add)
+            self._count(added=accepted or ())
+        return rejected
+
+    def _count(self, removed=(), added=()):
+        # Keep the aggregates in step with an entries write; called under _entries_lock
+        deltas = _aggregate_deltas(removed, -1) + _aggregate_deltas(added, 1)
+        if deltas and self.version("aggregates"):
+            self.adjust_aggregates(deltas)
+
+    def delete_entry(self, entry_id, check=None):
+        """Delete an entry by id. Returns the removed entries.
+
+        check(removed) runs before anything is written and may raise to
+        cancel the delete.
+        """
+        removed = []
+
+        def delete(entries):
+            removed[:] = [e for e in entries if e['id'] == entry_id]
+            if removed and check:
+                check(removed)
+            entries[:] = [e for e in entries if e['id'] != entry_id]
+            return removed or None
+
+        with _entries_lock:
+            self.update("entries", delete)
+            self._count(removed=removed)
+        return removed
+
+    def rebucket_entries(self, start_date, end_date, resolve, check=None):
+        """Re-resolve the period of entries dated start_date..end_date (None for open-ended).
+
+        resolve(date) gives the periodId; only entries whose period changes
+        are written. check(moved) runs before anything is written and may
+        raise to cancel. Returns [(entry before, entry after)].
+        """
+        moved = []
+
+        def rebucket(entries):
+            moved[:] = _rebucket(_filter_entries(entries, None, start_date, end_date), resolve)
+            if moved and check:
+                check(moved)
+            return moved or None
+
+        with _entries_lock:
+            self.update("entries", rebucket)
+            self._count(removed=[before for before, _ in moved], added=[after for _, after in moved])
+        return moved
+
+    def update_payment(self, period_id, user_id, changes):
+        return self.update_payments([(period_id, user_id, changes)])[0]
+
+    def update_payments(self, changes):
+        """Merge [(period_id, user_id, fields)] into the payment records in one write. Returns the payments."""
+        def upsert(payments):
+            index = {(p['periodId'], p['userId']): p for p in payments}
+            result = []
+            for period_id, user_id, fields in changes:
+                payment = index.get((period_id, user_id))
+                if payment is None:
+                    payment = index[(period_id, user_id)] = {"periodId": period_id, "userId": user_id}
+                    payments.append(payment)
+                payment.update(fields)
+                result.append(payment)
+            return result
+
+        return self.update("payments", upsert)
+
+    def update_user(self, user_id, changes):
+        return self.update("users", _merge_user(user_id, changes))
+
+    def sum_entry_hours(self, user_id, start_date, end_date):
+        return sum(e['duration'] for e in self._matching_entries(user_id, start_date, end_date))
+
+    def _matching_entries(self, user_id, start_date, end_date):
+        return _filter_entries(self.read("entries"), user_id, start_date, end_date)
+
+    def iter_entries(self, user_id, start_date, end_date, period_id):
+        """Stream matching entries straight from disk, bypassing the read cache."""
+        return _filter_entries(self._stream_entries(), user_id, start_date, end_date, period_id)
+
+    def _stream_entries(self):
+        return _iter_json_array(self.files["entries"])
+
+    def query_entries(self, user_id, start_date, end_date, offset, limit, order):
+        # Only the requested page is kept sorted, not the whole history
+        pick = heapq.nlargest if order == "desc" else heapq.nsmallest
+        page = pick(offset + limit, self._matching_entries(user_id, start_date, end_date), key=_entry_sort_key)
+        return page[offset:]
+
+    def count_entries(self, user_id, start_date, end_date):
+        return sum(1 for _ in self._matching_entries(user_id, start_date, end_date))
+
+    def compute_aggregates(self):
+        return _sum_by_period_user(self.read("entries"))
+
+    def adjust_aggregates(self, deltas):
+        def adjust(rows):
+            _apply_deltas(rows, deltas)
+            return True
+
+        self.update("aggregates", adjust)
+
+    def payments_for_period(self, period_id):
+        return {p['userId']: p for p in self.read("payments") if p['periodId'] == period_id}
+
+
+class JournalStorage(JsonStorage):
+    """JSON storage where entry writes are appended to a JSONL log.
+
+    Reads replay the log on top of the entries.json snapshot. Once the log
+    passes JOURNAL_COMPACT_BYTES a background thread folds it into a new
+    snapshot, so a write costs one appended line regardless of history size.
+    """
+    name = "journal"
+
+    def __init__(self, log_path=ENTRIES_LOG_FILE, compact_bytes=JOURNAL_COMPACT_BYTES):
+        self.log_path = log_path
+        self.compacting_path = log_path + ".compacting"
+        self.compact_bytes = compact_bytes
+        self._compactor_lock = threading.Lock()
+        self._compactor = None
+        # (version, set of (userId, date)) kept current across our own appends
+        self._days = (None, None)
+
+    def load(self, dataset):
+        if dataset != "entries":
+            return super().load(dataset)
+        return self._replay(super().load("entries"), self._read_log(self.compacting_path) + self._read_log(self.log_path))
+
+    def version(self, dataset):
+        if dataset != "entries":
+            return super().version(dataset)
+        return tuple(_file_version(p) for p in (self.files["entries"], self.compacting_path, self.log_path))
+
+    def save(self, dataset, records):
+        if dataset != "entries":
+            return super().save(dataset, records)
+        # The compaction lock is always taken before the log lock
+        with _file_lock(self.compacting_path), _file_lock(self.log_path):
+            _save_json(self.files["entries"], records)
+            for path in (self.compacting_path, self.log_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            _data_changed(self.files["entries"])
+
+    def update(self, dataset, mutate):
+        if dataset != "entries":
+            return super().update(dataset, mutate)
+        # Whole-dataset rewrites of entries go through save() under the log locks
+        with _file_lock(self.compacting_path), _file_lock(self.log_path):
+            records = _thaw(self.load("entries"))
+            result = mutate(records)
+            if result is None:
+                _data_seen(self.files["entries"])
+                return None
+            _save_json(self.files["entries"], records)
+            for path in (self.compacting_path, self.log_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            _data_changed(self.files["entries"])
+        return result
+
+    def add_entries(self, new_entries):
+        rejected = []
+
+        def check():
+            version, days = self._days
+            if version != self.version("entries"):
+                days = {(e['userId'], e['date']) for e in self.load("entries")}
+            rejected[:], accepted = _split_duplicates(new_entries, days)
+            days.update((e['userId'], e['date']) for e in accepted)
+            self._days = (None, days)
+            return [{"op": "put", "entry": e} for e in accepted]
+
+        with _entries_lock:
+            version = self._append(check)
+            if version is not None:
+                self._days = (version, self._days[1])
+                rejected_ids = {e['id'] for e in rejected}
+                self._count(added=[e for e in new_entries if e['id'] not in rejected_ids])
+        return rejected
+
+    def delete_entry(self, entry_id, check=None):
+        removed = []
+
+        def find():
+            removed[:] = [_thaw(e) for e in self.read("entries") if e['id'] == entry_id]
+            if removed and check:
+                check(removed)
+            return [{"op": "del", "id": entry_id}] if removed else []
+
+        with _entries_lock:
+            self._append(find)
+            self._count(removed=removed)
+        return removed
+
+    def rebucket_entries(self, start_date, end_date, resolve, check=None):
+        # Only the moved entries are appended, however long the history
+        moved = []
+
+        def find():
+            matching = (_thaw(e) for e in _filter_entries(self.read("entries"), None, start_date, end_date))
+            moved[:] = _rebucket(matching, resolve)
+            if moved and check:
+                check(moved)
+            return [{"op": "put", "entry": after} for _, after in moved]
+
+        with _entries_lock:
+            self._append(find)
+            self._count(removed=[before for before, _ in moved], added=[after for _, after in moved])
+        return moved
+
+    def _append(self, make_records):
+        # make_records() runs under the log lock and returns the records to write.
+        # Returns the entries version right after the write, or None if nothing was written.
+        with _file_lock(self.log_path):
+            records = make_records()
+            if not records:
+                return None
+            with open(self.log_path, 'a') as f:
+                f.write("".join(json.dumps(r) + "\n" for r in records))
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            _data_changed(self.files["entries"])
+            version = self.version("entries")
+        if size >= self.compact_bytes:
+            self._compact_in_background()
+        return version
+
+    @staticmethod
+    def _read_log(path):
+        if not os.path.exists(path):
+            return []
+        ops = []
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    ops.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final line from an interrupted write; ignore it
+                    continue
+        return ops
+
+    @staticmethod
+    def _replay(entries, ops):
+        # Puts replace an entry with the same id and deletes drop every earlier
+        # entry with that id, so replaying a log twice gives the same result.
+        entries = list(entries)
+        positions = {e['id']: i for i, e in enumerate(entries)}
+        cutoff = {}
+        for op in ops:
+            if op.get('op') == 'put':
+                entry = op['entry']
+                i = positions.get(entry['id'])
+                if i is None:
+                    positions[entry['id']] = len(entries)
+                    entries.append(entry)
+                else:
+                    entries[i] = entry
+            elif op.get('op') == 'del':
+                cutoff[op['id']] = len(entries)
+                positions.pop(op['id'], None)
+        if not cutoff:
+            return entries
+        return [e for i, e in enumerate(entries) if i >= cutoff.get(e['id'], 0)]
+
+    def _stream_entries(self):
+        # Same result as _replay, but the snapshot is streamed; only the log is held in memory
+        logged = {}
+        deleted = set()
+        for op in self._read_log(self.compacting_path) + self._read_log(self.log_path):
+            if op.get('op') == 'put':
+                logged[op['entry']['id']] = op['entry']
+            elif op.get('op') == 'del':
+                logged.pop(op['id'], None)
+                deleted.add(op['id'])
+        for e in super()._stream_entries():
+            if e['id'] in deleted:
+                continue
+            yield logged.pop(e['id'], e)
+        yield from logged.values()
+
+    def _compact_in_background(self):
+        with self._compactor_lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self.compact, name="entries-journal-compactor", daemon=True)
+            self._compactor.start()
+
+    def compact(self):
+        """Fold the entries log into a new entries.json snapshot."""
+        # Only one compaction at a time, across processes
+        with _file_lock(self.compacting_path):
+            with _file_lock(self.log_path):
+                # New writes go to a fresh log while the rotated one is folded in.
+                # A leftover .compacting file from an interrupted run is folded first.
+                if not os.path.exists(self.compacting_path):
+                    if not os.path.exists(self.log_path):
+                        return
+                    os.replace(self.log_path, self.compacting_path)
+            entries = self._replay(super().load("entries"), self._read_log(self.compacting_path))
+            _save_json(self.files["entries"], entries)
+            os.remove(self.compacting_path)
+
+
+def _shard_summary(entries):
+    users = {}
+    for e in entries:
+        users[e['userId']] = users.get(e['userId'], 0) + 1
+    return {"count": len(entries), "users": users}
+
+
+class ShardedStorage(JsonStorage):
+    """JSON storage with entries split into one file per year.
+
+    Shards live in data/entries/<year>.json next to a manifest holding each
+    shard's entry count per user, so a query opens only the years it covers
+    and most counts need no shard at all. Reads cost the same however many
+    years of history there are. An existing entries.json (and journal log)
+    is split on first use and left in place.
+    """
+    name = "sharded"
+
+    def __init__(self, shard_dir=ENTRIES_SHARD_DIR):
+        self.shard_dir = shard_dir
+        self.manifest_path = os.path.join(shard_dir, "manifest.json")
+        # Held for every entries write; separate from the manifest's own lock taken by _save_json
+        self.lock_path = os.path.join(shard_dir, "shards")
+        self._split_checked = False
+
+    def _shard_path(self, year):
+        return os.path.join(self.shard_dir, f"{year}.json")
+
+    def _manifest(self):
+        """Cached {year: {"count": n, "users": {userId: n}}} for every shard."""
+        if not self._split_checked:
+            self._split_legacy()
+        return _read_cache.get(self.manifest_path, lambda: _file_version(self.manifest_path), lambda: _load_json(self.manifest_path, {}))
+
+    def _split_legacy(self):
+        os.makedirs(self.shard_dir, exist_ok=True)
+        with _file_lock(self.lock_path):
+            if not os.path.exists(self.manifest_path):
+                # Reading through the journal also picks up any uncompacted entries log
+                self._write_all(JournalStorage().load("entries"))
+        self._split_checked = True
+
+    def _read_shard(self, year):
+        path = self._shard_path(year)
+        return _read_cache.get(path, lambda: _file_version(path), lambda: _load_json(path))
+
+    def _years(self, start_date=None, end_date=None, reverse=False):
+        """Shard years overlapping start_date..end_date, in order."""
+        return sorted(
+            (y for y in self._manifest()
+             if (start_date is None or y >= start_date[:4]) and (end_date is None or y <= end_date[:4])),
+            reverse=reverse
+        )
+
+    def _write_all(self, records):
+        # Caller holds the shards lock
+        by_year = {}
+        for e in records:
+            by_year.setdefault(e['date'][:4], []).append(e)
+        for year, entries in by_year.items():
+            _save_json(self._shard_path(year), entries)
+        for year in _load_json(self.manifest_path, {}):
+            if year not in by_year and os.path.exists(self._shard_path(year)):
+                os.remove(self._shard_path(year))
+        _save_json(self.manifest_path, {year: _shard_summary(entries) for year, entries in by_year.items()})
+
+    def load(self, dataset):
+        if dataset != "entries":
+            return super().load(dataset)
+        return [e for year in self._years() for e in _load_json(self._shard_path(year))]
+
+    def version(self, dataset):
+        if dataset != "entries":
+            return super().version(dataset)
+        years = self._years()
+        return (_file_version(self.manifest_path),) + tuple(_file_version(self._shard_path(y)) for y in years)
+
+    def read(self, dataset):
+        if dataset != "entries":
+            return super().read(dataset)
+        # All shards joined; only built for callers that need every entry
+        return _read_cache.get(
+            (self.shard_dir, "all"), lambda: self.version("entries"),
+            lambda: [e for year in self._years() for e in self._read_shard(year)]
+        )
+
+    def save(self, dataset, records):
+        if dataset != "entries":
+            return super().save(dataset, records)
+        self._manifest()
+        with _file_lock(self.lock_path):
+            self._write_all(records)
+
+    def update(self, dataset, mutate):
+        if dataset != "entries":
+            return super().update(dataset, mutate)
+        self._manifest()
+        # Entry writes are serialized on the shards lock, so no retries are needed
+        with _file_lock(self.lock_path):
+            records = self.load("entries")
+            result = mutate(records)
+            if result is not None:
+                self._write_all(records)
+            else:
+                _data_seen(self.manifest_path, (self.shard_dir, "all"))
+            return result
+
+    def entry_exists(self, user_id, date):
+        if date[:4] not in self._manifest():
+            return False
+        return any(e['userId'] == user_id and e['date'] == date for e in self._read_shard(date[:4]))
+
+    def add_entries(self, new_entries):
+        by_year = {}
+        for e in new_entries:
+            by_year.setdefault(e['date'][:4], []).append(e)
+
+        rejected = []
+        self._manifest()
+        with _entries_lock, _file_lock(self.lock_path):
+            manifest = _load_json(self.manifest_path, {})
+            for year, batch in by_year.items():
+                path = self._shard_path(year)
+                entries = _load_json(path)
+                skipped, accepted = _split_duplicates(batch, {(e['userId'], e['date']) for e in entries})
+                rejected += skipped
+                if accepted:
+                    entries.extend(accepted)
+                    _save_json(path, entries)
+                    manifest[year] = _shard_summary(entries)
+                    self._count(added=accepted)
+            if len(rejected) < len(new_entries):
+                _save_json(self.manifest_path, manifest)
+        return rejected
+
+    def delete_entry(self, entry_id, check=None):
+        self._manifest()
+        with _entries_lock, _file_lock(self.lock_path):
+            manifest = _load_json(self.manifest_path, {})
+            # Newest first, since recent entries are the ones usually deleted
+            for year in sorted(manifest, reverse=True):
+                if not any(e['id'] == entry_id for e in self._read_shard(year)):
+                    continue
+                path = self._shard_path(year)
+                entries = _load_json(path)
+                removed = [e for e in entries if e['id'] == entry_id]
+                if check:
+                    check(removed)
+                entries = [e for e in entries if e['id'] != entry_id]
+                _save_json(path, entries)
+                manifest[year] = _shard_summary(entries)
+                _save_json(self.manifest_path, manifest)
+                self._count(removed=removed)
+                return removed
+        return []
+
+    def rebucket_entries(self, start_date, end_date, resolve, check=None):
+        # Only the shards in range are read and only those with moved entries rewritten
+        moved = []
+        changed = {}
+        self._manifest()
+        with _entries_lock, _file_lock(self.lock_path):
+            for year in self._years(start_date, end_date):
+                entries = _load_json(self._shard_path(year))
+                found = _rebucket(_filter_entries(entries, None, start_date, end_date), resolve)
+                if found:
+                    moved += found
+                    changed[year] = entries
+            if moved and check:
+                check(moved)
+            # Per-user counts are unchanged, so the manifest stays as it is
+            for year, entries in changed.items():
+                _save_json(self._shard_path(year), entries)
+            self._count(removed=[before for before, _ in moved], added=[after for _, after in moved])
+        return moved
+
+    def _matching_entries(self, user_id, start_date, end_date):
+        for year in self._years(start_date, end_date):
+            yield from _filter_entries(self._read_shard(year), user_id, start_date, end_date)
+
+    def iter_entries(self, user_id, start_date, end_date, period_id):
+        for year in self._years(start_date, end_date):
+            yield from _filter_entries(_iter_json_array(self._shard_path(year)), user_id, start_date, end_date, period_id)
+
+    def query_entries(self, user_id, start_date, end_date, offset, limit, order):
+        # Shards cover disjoint years, so walk them in order and stop once the page is full
+        pick = heapq.nlargest if order == "desc" else heapq.nsmallest
+        page = []
+        for year in self._years(start_date, end_date, reverse=order == "desc"):
+            matches = _filter_entries(self._read_shard(year), user_id, start_date, end_date)
+            page += pick(offset + limit - len(page), matches, key=_entry_sort_key)
+            if len(page) >= offset + limit:
+                break
+        return page[offset:]
+
+    def count_entries(self, user_id, start_date, end_date):
+        manifest = self._manifest()
+        total = 0
+        for year in self._years(start_date, end_date):
+            whole_year = (start_date is None or start_date <= f"{year}-01-01") and (end_date is None or end_date >= f"{year}-12-31")
+            if whole_year:
+                shard = manifest[year]
+                total += shard['count'] if user_id is None else shard['users'].get(user_id, 0)
+            else:
+                total += sum(1 for _ in _filter_entries(self._read_shard(year), user_id, start_date, end_date))
+        return total
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (id TEXT NOT NULL, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS periods (id TEXT NOT NULL, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT NOT NULL,
+    userId TEXT NOT NULL,
+    date TEXT NOT NULL,
+    startTime TEXT,
+    periodId TEXT,
+    duration REAL NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS payments (
+    periodId TEXT NOT NULL,
+    userId TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (periodId, userId)
+);
+CREATE TABLE IF NOT EXISTS aggregates (
+    periodId TEXT NOT NULL,
+    userId TEXT NOT NULL,
+    userName TEXT,
+    hours REAL NOT NULL,
+    entries INTEGER NOT NULL,
+    PRIMARY KEY (periodId, userId)
+);
+CREATE TABLE IF NOT EXISTS snapshots (id TEXT NOT NULL, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (id TEXT NOT NULL, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS versions (
+    dataset TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+# Created after any column upgrades so they can refer to new columns
+_SQLITE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_entries_id ON entries (id);
+CREATE INDEX IF NOT EXISTS idx_entries_user_date ON entries (userId, date);
+CREATE INDEX IF NOT EXISTS idx_entries_period_user ON entries (periodId, userId);
+CREATE INDEX IF NOT EXISTS idx_entries_date ON entries (date);
+CREATE INDEX IF NOT EXISTS idx_entries_date_time ON entries (date, startTime);
+"""
+
+
+class SqliteStorage:
+    """Stores datasets as indexed rows in a single SQLite database (WAL mode)."""
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        # Streamlit runs each session in its own thread; sqlite connections
+        # must not be shared between threads.
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            _ensure_data_dir()
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SQLITE_SCHEMA)
+            self._upgrade(conn)
+            conn.executescript(_SQLITE_INDEXES)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _upgrade(conn):
+        # Databases created by earlier versions lack newer entry columns
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+        if "startTime" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE entries ADD COLUMN startTime TEXT")
+                conn.execute("UPDATE entries SET startTime = json_extract(doc, '$.startTime')")
+
+    def load(self, dataset):
+        if dataset == "aggregates":
+            rows = self._conn().execute(
+                "SELECT periodId, userId, userName, hours, entries FROM aggregates ORDER BY rowid"
+            )
+            return [dict(zip(("periodId", "userId", "userName", "hours", "entries"), row)) for row in rows]
+        rows = self._conn().execute(f"SELECT doc FROM {dataset} ORDER BY rowid")
+        return [json.loads(doc) for (doc,) in rows]
+
+    def version(self, dataset):
+        # Bumped by every write below, so other processes' writes are seen too
+        row = self._conn().execute("SELECT version FROM versions WHERE dataset = ?", (dataset,)).fetchone()
+        return row[0] if row else 0
+
+    def read(self, dataset):
+        """Return a cached, read-only view of a dataset."""
+        return _read_cache.get((self.path, dataset), lambda: self.version(dataset), lambda: self.load(dataset))
+
+    def _changed(self, conn, dataset):
+        conn.execute(
+            "INSERT INTO versions (dataset, version) VALUES (?, 1) "
+            "ON CONFLICT (dataset) DO UPDATE SET version = version + 1",
+            (dataset,)
+        )
+        _read_cache.invalidate((self.path, dataset))
+        self._local.changed = True
+
+    @contextmanager
+    def _transaction(self, immediate=True):
+        """A write transaction; other processes are signalled once it commits with changes."""
+        conn = self._conn()
+        self._local.changed = False
+        with conn:
+            if immediate:
+                # Take the write lock before reading so two processes can't interleave
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+        if self._local.changed:
+            _publish_change()
+
+    def save(self, dataset, records):
+        with self._transaction(immediate=False) as conn:
+            self._save_rows(conn, dataset, records)
+
+    def update(self, dataset, mutate):
+        """Read-modify-write a dataset inside one write transaction (see JsonStorage.update)."""
+        with self._transaction() as conn:
+            records = self.load(dataset)
+            result = mutate(records)
+            if result is not None:
+                self._save_rows(conn, dataset, records)
+        if result is None:
+            _data_seen((self.path, dataset))
+        return result
+
+    def _save_rows(self, conn, dataset, records):
+        self._changed(conn, dataset)
+        conn.execute(f"DELETE FROM {dataset}")
+        if dataset == "entries":
+            conn.executemany(
+                "INSERT INTO entries (id, userId, date, startTime, periodId, duration, doc) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._entry_row(e) for e in records]
+            )
+        elif dataset == "aggregates":
+            conn.executemany(
+                "INSERT INTO aggregates (periodId, userId, userName, hours, entries) VALUES (?, ?, ?, ?, ?)",
+                [(r['periodId'], r['userId'], r.get('userName'), r['hours'], r['entries']) for r in records]
+            )
+        elif dataset == "payments":
+            conn.executemany(
+                "INSERT OR REPLACE INTO payments (periodId, userId, doc) VALUES (?, ?, ?)",
+                [(p['periodId'], p['userId'], json.dumps(p)) for p in records]
+            )
+        else:
+            conn.executemany(
+                f"INSERT INTO {dataset} (id, doc) VALUES (?, ?)",
+                [(r['id'], json.dumps(r)) for r in records]
+            )
+
+    @staticmethod
+    def _entry_row(entry):
+        return (
+            entry['id'],
+            entry['userId'],
+            entry['date'],
+            entry.get('startTime'),
+            _entry_period_id(entry),
+            entry.get('duration', 0),
+            json.dumps(entry)
+        )
+
+    def entry_exists(self, user_id, date, conn=None):
+        row = (conn or self._conn()).execute(
+            "SELECT 1 FROM entries WHERE userId = ? AND date = ? LIMIT 1", (user_id, date)
+        ).fetchone()
+        return row is not None
+
+    def add_entry(self, entry):
+        if self.add_entries([entry]):
+            raise DuplicateEntryError(entry['userId'], entry['date'])
+
+    def add_entries(self, new_entries):
+        # The write lock is taken before checking so two processes can't both pass the check
+        with self._transaction() as conn:
+            existing = {
+                (e['userId'], e['date']) for e in new_entries
+                if self.entry_exists(e['userId'], e['date'], conn)
+            }
+            rejected, accepted = _split_duplicates(new_entries, existing)
+            if accepted:
+                self._changed(conn, "entries")
+                conn.executemany(
+                    "INSERT INTO entries (id, userId, date, startTime, periodId, duration, doc) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [self._entry_row(e) for e in accepted]
+                )
+                self._count(conn, added=accepted)
+        return rejected
+
+    def delete_entry(self, entry_id, check=None):
+        with self._transaction() as conn:
+            removed = [json.loads(doc) for (doc,) in conn.execute("SELECT doc FROM entries WHERE id = ?", (entry_id,))]
+            if removed:
+                if check:
+                    check(removed)
+                self._changed(conn, "entries")
+                conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+                self._count(conn, removed=removed)
+        return removed
+
+    def rebucket_entries(self, start_date, end_date, resolve, check=None):
+        where, params = self._entry_filter(None, start_date, end_date)
+        with self._transaction() as conn:
+            entries = [json.loads(doc) for (doc,) in conn.execute(f"SELECT doc FROM entries{where}", params)]
+            moved = _rebucket(entries, resolve)
+            if moved:
+                if check:
+                    check(moved)
+                self._changed(conn, "entries")
+                conn.executemany(
+                    "UPDATE entries SET periodId = ?, doc = ? WHERE id = ?",
+                    [(after['periodId'], json.dumps(after), after['id']) for _, after in moved]
+                )
+                self._count(conn, removed=[before for before, _ in moved], added=[after for _, after in moved])
+        return moved
+
+    def update_payment(self, period_id, user_id, changes):
+        return self.update_payments([(period_id, user_id, changes)])[0]
+
+    def update_payments(self, changes):
+        result = []
+        with self._transaction() as conn:
+            self._changed(conn, "payments")
+            for period_id, user_id, fields in changes:
+                row = conn.execute(
+                    "SELECT doc FROM payments WHERE periodId = ? AND userId = ?", (period_id, user_id)
+                ).fetchone()
+                payment = json.loads(row[0]) if row else {"periodId": period_id, "userId": user_id}
+                payment.update(fields)
+                conn.execute(
+                    "INSERT INTO payments (periodId, userId, doc) VALUES (?, ?, ?) "
+                    "ON CONFLICT (periodId, userId) DO UPDATE SET doc = excluded.doc",
+                    (period_id, user_id, json.dumps(payment))
+                )
+                result.append(payment)
+        return result
+
+    def update_user(self, user_id, changes):
+        return self.update("users", _merge_user(user_id, changes))
+
+    def sum_entry_hours(self, user_id, start_date, end_date):
+        row = self._conn().execute(
+            "SELECT COALESCE(SUM(duration), 0) FROM entries WHERE userId = ? AND date BETWEEN ? AND ?",
+            (user_id, start_date, end_date)
+        ).fetchone()
+        return row[0]
+
+    @staticmethod
+    def _entry_filter(user_id, start_date, end_date, period_id=None):
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("userId = ?")
+            params.append(user_id)
+        if start_date is not None:
+            clauses.append("date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            clauses.append("date <= ?")
+            params.append(end_date)
+        if period_id is not None:
+            clauses.append("periodId = ?")
+            params.append(period_id)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query_entries(self, user_id, start_date, end_date, offset, limit, order):
+        where, params = self._entry_filter(user_id, start_date, end_date)
+        direction = "DESC" if order == "desc" else "ASC"
+        rows = self._conn().execute(
+            f"SELECT doc FROM entries{where} ORDER BY date {direction}, startTime {direction} LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        )
+        return [_freeze(json.loads(doc)) for (doc,) in rows]
+
+    def count_entries(self, user_id, start_date, end_date):
+        where, params = self._entry_filter(user_id, start_date, end_date)
+        return self._conn().execute(f"SELECT COUNT(*) FROM entries{where}", params).fetchone()[0]
+
+    def iter_entries(self, user_id, start_date, end_date, period_id):
+        where, params = self._entry_filter(user_id, start_date, end_date, period_id)
+        # The cursor fetches rows as they are consumed
+        for (doc,) in self._conn().execute(f"SELECT doc FROM entries{where} ORDER BY rowid", params):
+            yield json.loads(doc)
+
+    def compute_aggregates(self):
+        rows = self._conn().execute(
+            "SELECT periodId, userId, MAX(json_extract(doc, '$.userName')), ROUND(SUM(duration), 2), COUNT(*) "
+            "FROM entries WHERE periodId IS NOT NULL GROUP BY periodId, userId"
+        )
+        return [
+            {"periodId": p, "userId": u, "userName": name or 'Unknown', "hours": hours, "entries": count}
+            for p, u, name, hours, count in rows
+        ]
+
+    def adjust_aggregates(self, deltas):
+        with self._transaction(immediate=False) as conn:
+            self._apply_deltas(conn, deltas)
+
+    def _count(self, conn, removed=(), added=()):
+        # Keep the aggregates in step with an entries write, in its transaction
+        deltas = _aggregate_deltas(removed, -1) + _aggregate_deltas(added, 1)
+        if deltas and self.version("aggregates"):
+            self._apply_deltas(conn, deltas)
+
+    def _apply_deltas(self, conn, deltas):
+        # Rows that reach zero entries are kept so deltas commute (see _apply_deltas)
+        self._changed(conn, "aggregates")
+        for d in deltas:
+            conn.execute(
+                "INSERT INTO aggregates (periodId, userId, userName, hours, entries) VALUES (?, ?, ?, ROUND(?, 2), ?) "
+                "ON CONFLICT (periodId, userId) DO UPDATE SET "
+                "hours = ROUND(hours + excluded.hours, 2), entries = entries + excluded.entries",
+                (d['periodId'], d['userId'], d['userName'], d['hours'], d['entries'])
+            )
+
+    def payments_for_period(self, period_id):
+        rows = self._conn().execute("SELECT userId, doc FROM payments WHERE periodId = ?", (period_id,))
+        return {user_id: _freeze(json.loads(doc)) for user_id, doc in rows}
+
+
+class WriteBehindStorage:
+    """Wraps a storage backend so entry saves and payment/user updates return before they are written.
+
+    These writes (and the aggregate changes that go with them) are queued
+    in this process. One background thread commits everything queued
+    within WRITE_BEHIND_DELAY, one durable write per dataset. Reads through
+    the wrapper include queued writes. Any other write waits for the queue
+    to drain first, so writes keep their order. An entry is dropped at
+    commit, and reported on stderr, if another process saved one for the
+    same resource and day or its period was closed in the meantime.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.name = storage.name
+        self._reset()
+        # A forked child mustn't commit its parent's queue a second time
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        # Serializes the duplicate check and enqueue of new entries
+        self._add_lock = threading.Lock()
+        # Held while a batch is written, by the writer thread or flush()
+        self._commit_lock = threading.Lock()
+        # (kind, value) ops: queued, and the batch being committed
+        self._queue = []
+        self._batch = []
+        # Kinds of the batch already written
+        self._done = set()
+        # Bumped whenever the pending ops change; overlay views are cached against it
+        self._seq = 0
+        self._views = {}
+        self._writer = None
+
+    def __getattr__(self, name):
+        # Everything not overridden below goes straight to the backend
+        return getattr(self.storage, name)
+
+    # --- Queue ---
+    def _enqueue(self, kind, *values):
+        with self._cond:
+            self._queue.extend((kind, value) for value in values)
+            self._seq += 1
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._writer.start()
+            self._cond.notify_all()
+
+    def _pending(self):
+        # Ops not yet visible in the backend. Taken before reading the backend:
+        # a batch committed in between is then merged in twice, which the
+        # overlays below tolerate, rather than missed.
+        with self._cond:
+            return self._seq, [op for op in self._batch if op[0] not in self._done] + self._queue
+
+    def flush(self, timeout=None):
+        """Commit everything queued so far, in this thread. Returns False if the writer was busy past timeout."""
+        with self._cond:
+            if not self._queue and not self._batch:
+                return True
+        # Always _entries_lock before the commit lock, as in _drain, so a
+        # caller already holding _entries_lock can't deadlock with the writer
+        if not _entries_lock.acquire(timeout=-1 if timeout is None else timeout):
+            return False
+        try:
+            self._drain()
+        finally:
+            _entries_lock.release()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._batch)
+            time.sleep(WRITE_BEHIND_DELAY)
+            try:
+                self._drain()
+            except Exception as e:
+                # The batch is kept and retried; steps already written are skipped
+                print(f"write-behind commit failed, retrying: {e!r}", file=sys.stderr)
+                time.sleep(1)
+
+    def _drain(self):
+        # Commit the unfinished batch, if any, then everything queued
+        with _entries_lock, self._commit_lock:
+            while True:
+                with self._cond:
+                    if not self._batch:
+                        if not self._queue:
+                            return
+                        self._batch, self._queue = self._queue, []
+                        self._done = set()
+                self._commit(self._batch)
+                with self._cond:
+                    self._batch = []
+                    self._seq += 1
+                    self._cond.notify_all()
+
+    def _step_done(self, kind):
+        with self._cond:
+            self._done.add(kind)
+            self._seq += 1
+
+    def _commit(self, batch):
+        storage = self.storage
+        if "user" not in self._done:
+            merges = [_merge_user(*v) for kind, v in batch if kind == "user"]
+            if merges:
+                storage.update("users", lambda users: [merge(users) for merge in merges])
+            self._step_done("user")
+        if "entry" not in self._done:
+            entries = [v for kind, v in batch if kind == "entry"]
+            if entries:
+                # A period may have been closed since the entry was queued
+                closed = get_snapshots()
+                late = [e for e in entries if _entry_period_id(e) in closed]
+                for e in late:
+                    print(f"write-behind: dropped entry {e['id']}, period {_entry_period_id(e)} is closed", file=sys.stderr)
+                # The backend counts the accepted ones in the aggregates as it writes them
+                duplicates = storage.add_entries([e for e in entries if _entry_period_id(e) not in closed])
+                for e in duplicates:
+                    print(f"write-behind: dropped entry {e['id']}, {e['userId']} already has one on {e['date']}", file=sys.stderr)
+            self._step_done("entry")
+        if "payment" not in self._done:
+            changes = [v for kind, v in batch if kind == "payment"]
+            if changes:
+                storage.update_payments(changes)
+            self._step_done("payment")
+
+    # --- Queued writes ---
+    def add_entry(self, entry):
+        with self._add_lock:
+            if self.entry_exists(entry['userId'], entry['date']):
+                raise DuplicateEntryError(entry['userId'], entry['date'])
+            self._enqueue("entry", entry)
+
+    def update_payment(self, period_id, user_id, changes):
+        return self.update_payments([(period_id, user_id, changes)])[0]
+
+    def update_payments(self, changes):
+        # Queued together so the writer commits them in the same batch
+        self._enqueue("payment", *[(period_id, user_id, dict(fields)) for period_id, user_id, fields in changes])
+        return [self.payments_for_period(period_id)[user_id] for period_id, user_id, _ in changes]
+
+    def update_user(self, user_id, changes):
+        if not any(u['id'] == user_id for u in self.read("users")):
+            return None
+        self._enqueue("user", (user_id, dict(changes)))
+        return next(u for u in self.read("users") if u['id'] == user_id)
+
+    # --- Reads that include queued writes ---
+    def _queued_entries(self, pending):
+        # Queued entries the backend doesn't have yet
+        return [
+            v for kind, v in pending
+            if kind == "entry" and not self.storage.entry_exists(v['userId'], v['date'])
+        ]
+
+    def read(self, dataset):
+        seq, pending = self._pending()
+        overlay = getattr(self, f"_overlay_{dataset}", None)
+        if not pending or overlay is None:
+            return self.storage.read(dataset)
+        committed = self.storage.read(dataset)
+        cached = self._views.get(dataset)
+        if cached and cached[0] is committed and cached[1] == seq:
+            return cached[2]
+        view = overlay(committed, pending)
+        self._views[dataset] = (committed, seq, view)
+        return view
+
+    def _overlay_entries(self, committed, pending):
+        days = _entry_day_index(committed)
+        return committed + tuple(
+            _freeze(v) for kind, v in pending if kind == "entry" and (v['userId'], v['date']) not in days
+        )
+
+    def _overlay_payments(self, committed, pending):
+        changes = {}
+        for kind, v in pending:
+            if kind == "payment":
+                changes.setdefault(v[:2], {}).update(v[2])
+        payments = []
+        for p in committed:
+            fields = changes.pop((p['periodId'], p['userId']), None)
+            payments.append(_freeze({**p, **fields}) if fields else p)
+        payments += [_freeze({"periodId": period_id, "userId": user_id, **fields}) for (period_id, user_id), fields in changes.items()]
+        return tuple(payments)
+
+    def _overlay_users(self, committed, pending):
+        changes = {}
+        for kind, v in pending:
+            if kind == "user":
+                changes.setdefault(v[0], {}).update(v[1])
+        return tuple(_freeze({**u, **changes[u['id']]}) if u['id'] in changes else u for u in committed)
+
+    def _overlay_aggregates(self, committed, pending):
+        # Checked after committed was read: an entry written in between is
+        # then left out for a moment rather than counted twice
+        deltas = _aggregate_deltas(self._queued_entries(pending), 1)
+        if not deltas:
+            return committed
+        rows = [dict(r) for r in committed]
+        _apply_deltas(rows, deltas)
+        return _freeze(rows)
+
+    def entry_exists(self, user_id, date):
+        _, pending = self._pending()
+        if any(kind == "entry" and v['userId'] == user_id and v['date'] == date for kind, v in pending):
+            return True
+        return self.storage.entry_exists(user_id, date)
+
+    def query_entries(self, user_id, start_date, end_date, offset, limit, order):
+        _, pending = self._pending()
+        queued = list(_filter_entries(self._queued_entries(pending), user_id, start_date, end_date))
+        if not queued:
+            return self.storage.query_entries(user_id, start_date, end_date, offset, limit, order)
+        # Queued entries can land anywhere in the order, so place them among the first offset + limit
+        page = list(self.storage.query_entries(user_id, start_date, end_date, 0, offset + limit, order))
+        ids = {e['id'] for e in page}
+        page += [_freeze(e) for e in queued if e['id'] not in ids]
+        page.sort(key=_entry_sort_key, reverse=order == "desc")
+        return page[offset:offset + limit]
+
+    def count_entries(self, user_id, start_date, end_date):
+        _, pending = self._pending()
+        queued = list(_filter_entries(self._queued_entries(pending), user_id, start_date, end_date))
+        return self.storage.count_entries(user_id, start_date, end_date) + len(queued)
+
+    def sum_entry_hours(self, user_id, start_date, end_date):
+        _, pending = self._pending()
+        queued = _filter_entries(self._queued_entries(pending), user_id, start_date, end_date)
+        return self.storage.sum_entry_hours(user_id, start_date, end_date) + sum(e['duration'] for e in queued)
+
+    def payments_for_period(self, period_id):
+        _, pending = self._pending()
+        payments = self.storage.payments_for_period(period_id)
+        changes = [v for kind, v in pending if kind == "payment" and v[0] == period_id]
+        if not changes:
+            return payments
+        payments = dict(payments)
+        for _, user_id, fields in changes:
+            base = payments.get(user_id) or {"periodId": period_id, "userId": user_id}
+            payments[user_id] = _freeze({**base, **fields})
+        return payments
+
+    # --- Everything else waits for the queue first ---
+    def load(self, dataset):
+        self.flush()
+        return self.storage.load(dataset)
+
+    def save(self, dataset, records):
+        self.flush()
+        return self.storage.save(dataset, records)
+
+    def update(self, dataset, mutate):
+        self.flush()
+        return self.storage.update(dataset, mutate)
+
+    def add_entries(self, new_entries):
+        self.flush()
+        return self.storage.add_entries(new_entries)
+
+    def delete_entry(self, entry_id, check=None):
+        self.flush()
+        return self.storage.delete_entry(entry_id, check)
+
+    def rebucket_entries(self, start_date, end_date, resolve, check=None):
+        self.flush()
+        return self.storage.rebucket_entries(start_date, end_date, resolve, check)
+
+    def adjust_aggregates(self, deltas):
+        self.flush()
+        return self.storage.adjust_aggregates(deltas)
+
+    def iter_entries(self, user_id, start_date, end_date, period_id):
+        self.flush()
+        return self.storage.iter_entries(user_id, start_date, end_date, period_id)
+
+    def compute_aggregates(self):
+        self.flush()
+        return self.storage.compute_aggregates()
+
+
+_storage_backend = None
+_storage_lock = threading.Lock()
+
+def _storage():
+    global _storage_backend
+    if _storage_backend is None:
+        with _storage_lock:
+            if _storage_backend is None:
+                if STORAGE_BACKEND == "sqlite":
+                    storage = SqliteStorage()
+                elif STORAGE_BACKEND == "journal":
+                    storage = JournalStorage()
+                elif STORAGE_BACKEND == "sharded":
+                    storage = ShardedStorage()
+                elif STORAGE_BACKEND == "json":
+                    storage = JsonStorage()
+                else:
+                    raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+                # Other threads wait here until the data is up to date
+                _migrate_schema(storage)
+                if WRITE_BEHIND:
+                    storage = WriteBehindStorage(storage)
+                    atexit.register(storage.flush, WRITE_BEHIND_EXIT_TIMEOUT)
+                _storage_backend = storage
+    return _storage_backend
+
+def flush(timeout=None):
+    """Commit this process's queued write-behind writes now. Returns False on timeout."""
+    storage = _storage_backend
+    if isinstance(storage, WriteBehindStorage):
+        return storage.flush(timeout)
+    return True
+
+# --- Schema migrations ---
+# Applied once per data directory, when the storage backend is first
+# opened, so the read path never has to patch up old records. The applied
+# version is kept in the "meta" dataset. A step may run more than once
+# (e.g. two processes starting together), so each must be idempotent.
+ALL_APPS = ["Time Entry", "Summary", "Resource Management", "Payments", "Periods"]
+
+USER_DEFAULTS = {
+    "role": "MOA",
+    "active": True,
+    "password": "",
+    "assigned_apps": ALL_APPS
+}
+
+def _fill_user_defaults(storage):
+    def fill(users):
+        changed = 0
+        for user in users:
+            missing = [key for key in USER_DEFAULTS if key not in user]
+            for key in missing:
+                user[key] = list(USER_DEFAULTS[key]) if isinstance(USER_DEFAULTS[key], list) else USER_DEFAULTS[key]
+            changed += bool(missing)
+        return changed or None
+
+    storage.update("users", fill)
+
+def _extend_last_periods(storage):
+    # Period 26 used to end on Dec 30 (Dec 29 in leap years), so entries on
+    # the last days of the year were saved without a period. Open ones that
+    # no other period covers now run to Dec 31 and take those entries.
+    closed = {s['periodId'] for s in storage.read("snapshots")}
+    gaps = []
+
+    def extend(periods):
+        gaps.clear()
+        for period in periods:
+            year_end = f"{period['year']}-12-31"
+            if period['id'] != f"{period['year']}-P26" or period['id'] in closed or period['endDate'] >= year_end:
+                continue
+            if any(p['startDate'] <= year_end and p['endDate'] > period['endDate'] for p in periods):
+                continue
+            start = (date.fromisoformat(period['endDate']) + timedelta(days=1)).isoformat()
+            gaps.append((start, year_end))
+            period['endDate'] = year_end
+            period['label'] = _period_label(period['periodNum'], period['startDate'], year_end)
+        return bool(gaps) or None
+
+    if storage.update("periods", extend) is None:
+        return
+    calendar = PeriodCalendar(storage.read("periods"))
+
+    def resolve(date_str):
+        period = calendar.find(date_str)
+        return period['id'] if period else None
+
+    for start, end in gaps:
+        storage.rebucket_entries(start, end, resolve)
+
+# (version, step) in order
+SCHEMA_MIGRATIONS = [
+    (1, _fill_user_defaults),
+    (2, _extend_last_periods),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+def _schema_version(storage):
+    return next((m['version'] for m in storage.read("meta") if m['id'] == "schema"), 0)
+
+def _migrate_schema(storage):
+    """Run the migrations newer than the stored schema version. Returns the versions applied."""
+    current = _schema_version(storage)
+    applied = []
+    for version, step in SCHEMA_MIGRATIONS:
+        if version > current:
+            step(storage)
+            applied.append(version)
+    if applied:
+        def record(meta):
+            meta[:] = [m for m in meta if m['id'] != "schema"]
+            meta.append({"id": "schema", "version": SCHEMA_VERSION})
+            return True
+
+        storage.update("meta", record)
+    return applied
+
+def migrate_json_to_sqlite(db_path=SQLITE_FILE, overwrite=False):
+    """Copy the data/*.json files into a SQLite database. Returns row counts per dataset."""
+    target = SqliteStorage(db_path)
+    if not overwrite:
+        for dataset in DATASETS:
+            if target.load(dataset):
+                raise RuntimeError(f"{db_path} already contains {dataset}; pass overwrite=True to replace it")
+
+    # Reading through the journal also picks up any uncompacted entries log
+    source = _storage() if STORAGE_BACKEND == "sharded" else JournalStorage()
+    counts = {}
+    for dataset in DATASETS:
+        records = source.load(dataset)
+        target.save(dataset, records)
+        counts[dataset] = len(records)
+    closed = {s['periodId'] for s in target.load("snapshots")}
+    target.save("aggregates", [r for r in target.compute_aggregates() if r['periodId'] not in closed])
+    return counts
 
 # --- Users ---
-def get_users():
-    users = _load_json(USERS_FILE)
-    
-    # If no users exist, create a default Admin user
+class UserDirectory:
+    """Read-only lookups over the users by id and name, plus the active ones in stored order."""
+
+    def __init__(self, users):
+        self.users = users
+        self.active = tuple(u for u in users if u['active'])
+        self._by_id = {u['id']: u for u in users}
+        # The first user with a name wins, as the old linear scans did
+        self._by_name = {}
+        self._active_by_name = {}
+        for u in users:
+            self._by_name.setdefault(u['name'], u)
+        for u in self.active:
+            self._active_by_name.setdefault(u['name'], u)
+
+    def __iter__(self):
+        return iter(self.users)
+
+    def __len__(self):
+        return len(self.users)
+
+    def get(self, user_id):
+        return self._by_id.get(user_id)
+
+    def by_name(self, name, active=False):
+        return (self._active_by_name if active else self._by_name).get(name)
+
+
+_directory = (None, None)
+
+def get_user_directory():
+    """Return the UserDirectory for the current users, rebuilt only when they change."""
+    global _directory
+    users = _storage().read("users")
     if not users:
-        default_admin = {
-            "id": str(int(datetime.now().timestamp() * 1000)),
-            "name": "Admin",
-            "role": "Admin",
-            "active": True,
-            "password": "admin",
-            "assigned_apps": ["Time Entry", "Summary", "Resource Management", "Payments", "Periods"]
-        }
+        users = _create_default_admin()
+    source, directory = _directory
+    if source is not users:
+        directory = UserDirectory(users)
+        _directory = (users, directory)
+    return directory
+
+def _default_admin():
+    return {
+        "id": _new_id(),
+        "name": "Admin",
+        "role": "Admin",
+        "active": True,
+        "password": "admin",
+        "assigned_apps": list(ALL_APPS)
+    }
+
+def _create_default_admin():
+    default_admin = _default_admin()
+
+    def add_admin(users):
+        # Another session may have created it first
+        if users:
+            return None
         users.append(default_admin)
-        _save_json(USERS_FILE, users)
-        
-    # Ensure defaults for existing users
-    for user in users:
-        if 'role' not in user:
-            user['role'] = 'MOA'
-        if 'active' not in user:
-            user['active'] = True
-        if 'password' not in user:
-            user['password'] = "" # Default empty password
-        if 'assigned_apps' not in user:
-            # Default to all apps if not specified
-            user['assigned_apps'] = ["Time Entry", "Summary", "Resource Management", "Payments", "Periods"]
-    return users
+        return default_admin
+
+    _storage().update("users", add_admin)
+    return _storage().read("users")
+
+def get_users():
+    """All users, in stored order. A default Admin is created if there are none."""
+    return get_user_directory().users
 
 def save_user(name, role='MOA', active=True, password="", assigned_apps=None):
-    users = get_users()
     if assigned_apps is None:
-        assigned_apps = ["Time Entry", "Summary", "Resource Management", "Payments", "Periods"]
+        assigned_apps = list(ALL_APPS)
         
     new_user = {
-        "id": str(int(datetime.now().timestamp() * 1000)),
+        "id": _new_id(),
         "name": name,
         "role": role,
         "active": active,
         "password": password,
         "assigned_apps": assigned_apps
     }
-    users.append(new_user)
-    _save_json(USERS_FILE, users)
-    return new_user
+
+    def add(users):
+        # The first user saved into an empty directory still gets the Admin login beside it
+        if not users:
+            users.append(_default_admin())
+        users.append(new_user)
+        return new_user
+
+    return _storage().update("users", add)
 
 def update_user(user_id, user_data):
-    users = get_users()
-    for i, user in enumerate(users):
-        if user['id'] == user_id:
-            # specific handling for password update to avoid overwriting with empty if not provided
-            if 'password' in user_data and not user_data['password']:
-                del user_data['password']
-                
-            users[i].update(user_data)
-            _save_json(USERS_FILE, users)
-            return users[i]
-    return None
+    # specific handling for password update to avoid overwriting with empty if not provided
+    if 'password' in user_data and not user_data['password']:
+        del user_data['password']
+
+    return _storage().update_user(user_id, user_data)
 
 def delete_user(user_id):
-    users = get_users()
-    users = [u for u in users if u['id'] != user_id]
-    _save_json(USERS_FILE, users)
+    def delete(users):
+        remaining = [u for u in users if u['id'] != user_id]
+        if len(remaining) == len(users):
+            return None
+        users[:] = remaining
+        return True
+
+    _storage().update("users", delete)
 
 # --- Periods ---
 def get_periods():
-    periods = _load_json(PERIODS_FILE)
+    periods = _storage().read("periods")
     if not periods:
-        periods = generate_default_periods(datetime.now().year)
-        _save_json(PERIODS_FILE, periods)
+        def generate(periods):
+            # Another session may have generated them first
+            if periods:
+                return None
+            periods.extend(generate_default_periods(datetime.now().year))
+            return True
+
+        _storage().update("periods", generate)
+        periods = _storage().read("periods")
     return periods
 
 def save_periods(periods):
-    _save_json(PERIODS_FILE, periods)
+    _storage().save("periods", periods)
 
 def update_period(period_id, start_date, end_date):
-    periods = get_periods()
-    for period in periods:
-        if period['id'] == period_id:
-            period['startDate'] = start_date
-            period['endDate'] = end_date
-            
-            # Update label
-            s = datetime.strptime(start_date, '%Y-%m-%d')
-            e = datetime.strptime(end_date, '%Y-%m-%d')
-            period['label'] = f"Period {period['periodNum']}: {s.strftime('%b %-d')} - {e.strftime('%b %-d')}"
-            
-            _save_json(PERIODS_FILE, periods)
-            return True
-    return False
+    """Change a period's dates and move the entries whose period changes as a result.
+
+    Only entries dated within the old or new range can move, so only those
+    are re-bucketed. Raises PeriodClosedError if the period, or any closed
+    period overlapping either range, is closed.
+    """
+    if is_period_closed(period_id):
+        raise PeriodClosedError(period_id)
+    old = get_period_calendar().get(period_id)
+    if old is None:
+        return False
+    start = min(old['startDate'], start_date)
+    end = max(old['endDate'], end_date)
+    calendar = get_period_calendar()
+    for closed_id in get_snapshots():
+        closed = calendar.get(closed_id)
+        if closed and closed['startDate'] <= end and start <= closed['endDate']:
+            raise PeriodClosedError(closed_id)
+
+    def update(periods):
+        for period in periods:
+            if period['id'] == period_id:
+                period['startDate'] = start_date
+                period['endDate'] = end_date
+                period['label'] = _period_label(period['periodNum'], start_date, end_date)
+                return True
+        return None
+
+    if _storage().update("periods", update) is None:
+        return False
+    rebucket_entries(start, end)
+    return True
+
+def _period_label(number, start_date, end_date):
+    s = datetime.strptime(start_date, '%Y-%m-%d')
+    e = datetime.strptime(end_date, '%Y-%m-%d')
+    return f"Period {number}: {s.strftime('%b %-d')} - {e.strftime('%b %-d')}"
 
 def generate_default_periods(year):
     periods = []
     current_start = datetime(year, 1, 1)
     
     for i in range(1, 27):
-        current_end = current_start + timedelta(days=13)
-        
-        label = f"Period {i}: {current_start.strftime('%b %-d')} - {current_end.strftime('%b %-d')}"
+        # 26 x 14 days leaves a day or two over; the last period takes them
+        current_end = current_start + timedelta(days=13) if i < 26 else datetime(year, 12, 31)
+        start_date = current_start.strftime('%Y-%m-%d')
+        end_date = current_end.strftime('%Y-%m-%d')
         
         periods.append({
             "id": f"{year}-P{i}",
             "periodNum": i,
             "year": year,
-            "startDate": current_start.strftime('%Y-%m-%d'),
-            "endDate": current_end.strftime('%Y-%m-%d'),
-            "label": label
+            "startDate": start_date,
+            "endDate": end_date,
+            "label": _period_label(i, start_date, end_date)
         })
         
         current_start = current_end + timedelta(days=1)
         
     return periods
 
-def get_period_for_date(date_str):
+class PeriodCalendar:
+    """Sorted interval index over the periods for O(log n) date lookups."""
+
+    def __init__(self, periods):
+        self.periods = sorted(periods, key=lambda p: p['startDate'])
+        self._starts = [p['startDate'] for p in self.periods]
+        self._by_id = {p['id']: p for p in self.periods}
+        self.years = {p['year'] for p in self.periods}
+
+    def get(self, period_id):
+        return self._by_id.get(period_id)
+
+    def find(self, date_str):
+        # date_str is expected to be YYYY-MM-DD, so string order is date order
+        i = bisect_right(self._starts, date_str) - 1
+        if i >= 0 and date_str <= self.periods[i]['endDate']:
+            return self.periods[i]
+        return None
+
+
+_calendar = (None, None)
+
+def get_period_calendar():
+    """Return the PeriodCalendar for the current periods, rebuilt only when they change."""
+    global _calendar
     periods = get_periods()
-    # date_str is expected to be YYYY-MM-DD
-    for p in periods:
-        if p['startDate'] <= date_str <= p['endDate']:
-            return p
-    return None
+    source, calendar = _calendar
+    if source is not periods:
+        calendar = PeriodCalendar(periods)
+        _calendar = (periods, calendar)
+    return calendar
+
+def ensure_period_years(years):
+    """Generate and save default periods for any of the given years not in the calendar yet."""
+    years = set(years)
+    if years <= get_period_calendar().years:
+        return get_period_calendar()
+
+    def generate(periods):
+        missing = sorted(years - {p['year'] for p in periods})
+        if not missing:
+            return None
+        for year in missing:
+            periods.extend(generate_default_periods(year))
+        return True
+
+    _storage().update("periods", generate)
+    return get_period_calendar()
+
+def assign_periods(dates):
+    """Resolve many YYYY-MM-DD dates at once. Returns {date: period or None}."""
+    dates = set(dates)
+    calendar = get_period_calendar()
+    years = {int(d[:4]) for d in dates}
+    if not years <= calendar.years:
+        calendar = ensure_period_years(years)
+    return {d: calendar.find(d) for d in dates}
+
+def get_period_for_date(date_str):
+    return assign_periods([date_str])[date_str]
 
 # --- Entries ---
 def get_entries():
-    return _load_json(ENTRIES_FILE)
+    return _storage().read("entries")
 
 def calculate_duration(start_time, end_time):
     if not start_time or not end_time:
@@ -171,53 +2196,356 @@ def calculate_duration(start_time, end_time):
     return round(diff / 60.0, 2)
 
 def save_entry(entry_data):
-    entries = get_entries()
+    """Save a time entry. Raises DuplicateEntryError if the user already has one that day."""
     period = get_period_for_date(entry_data['date'])
     
     new_entry = {
-        "id": str(int(datetime.now().timestamp() * 1000)),
+        "id": _new_id(),
         **entry_data,
         "duration": calculate_duration(entry_data['startTime'], entry_data['endTime']),
-        "period": period
+        "periodId": period['id'] if period else None
     }
-    entries.append(new_entry)
-    _save_json(ENTRIES_FILE, entries)
+    storage = _storage()
+    # A queued entry is checked against closed periods again when committed,
+    # and waiting on _entries_lock here would mean waiting for the writer
+    with nullcontext() if isinstance(storage, WriteBehindStorage) else _entries_lock:
+        _check_open([new_entry])
+        storage.add_entry(new_entry)
     return new_entry
 
 def delete_entry(entry_id):
-    entries = get_entries()
-    entries = [e for e in entries if e['id'] != entry_id]
-    _save_json(ENTRIES_FILE, entries)
+    """Delete a time entry. Raises PeriodClosedError if its period is closed."""
+    # Opened first: opening may run migrations, which take _entries_lock
+    storage = _storage()
+    with _entries_lock:
+        storage.delete_entry(entry_id, check=_check_open)
+
+def rebucket_entries(start=None, end=None):
+    """Reassign entries dated start..end (inclusive, YYYY-MM-DD) to the period containing them.
+
+    Used by update_period and to repair entries saved before their period's
+    dates changed. Returns the number of entries moved.
+    """
+    calendar = get_period_calendar()
+
+    def resolve(date_str):
+        period = calendar.find(date_str)
+        return period['id'] if period else None
+
+    with _entries_lock:
+        moved = _storage().rebucket_entries(start, end, resolve, check=_check_moves_open)
+    return len(moved)
+
+def get_entry_period(entry):
+    """The period an entry belongs to, looked up from the current periods."""
+    period_id = _entry_period_id(entry)
+    return get_period_calendar().get(period_id) if period_id else None
+
+def normalize_entries():
+    """Rewrite entries that embed a full period to store only its periodId. Returns the number rewritten."""
+    def normalize(entries):
+        changed = 0
+        for e in entries:
+            if 'period' in e:
+                e['periodId'] = _entry_period_id(e)
+                del e['period']
+                changed += 1
+        return changed or None
+
+    storage = _storage()
+    with _entries_lock:
+        return storage.update("entries", normalize) or 0
+
+# --- Bulk import ---
+
+def read_entry_rows(path, fmt=None):
+    """Stream rows from a CSV file (with a header row) or a JSONL file.
+
+    The format is taken from the file extension unless fmt is "csv" or
+    "jsonl". JSONL lines that are not JSON objects are yielded as None so
+    the importer can report them.
+    """
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, newline='') as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        elif fmt == "jsonl":
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    row = None
+                yield row if isinstance(row, dict) else None
+        else:
+            raise ValueError(f"Unknown import format: {fmt}")
+
+_TIME_RE = re.compile(r"(\d{1,2}):(\d{2})")
+
+def _parse_import_row(row, directory):
+    # Returns (entry_data, None) or (None, error message)
+    if row is None:
+        return None, "not a JSON object"
+
+    user_id, user_name = row.get('userId') or "", row.get('userName') or ""
+    if not isinstance(user_id, str) or not isinstance(user_name, str):
+        return None, f"unknown resource {user_id or user_name!r}"
+    user = directory.get(user_id) or directory.by_name(user_name)
+    if user is None:
+        return None, f"unknown resource {row.get('userId') or row.get('userName')!r}"
+
+    # strptime is slow enough to dominate a large import
+    try:
+        date_str = date.fromisoformat(str(row.get('date', '')).strip()).isoformat()
+    except ValueError:
+        return None, f"invalid date {row.get('date')!r} (expected YYYY-MM-DD)"
+
+    times = []
+    for field in ('startTime', 'endTime'):
+        match = _TIME_RE.fullmatch(str(row.get(field, '')).strip())
+        if not match or int(match[1]) > 23 or int(match[2]) > 59:
+            return None, f"invalid {field} {row.get(field)!r} (expected HH:MM)"
+        times.append(f"{int(match[1]):02d}:{match[2]}")
+
+    return {
+        "userId": user['id'],
+        "userName": user['name'],
+        "date": date_str,
+        "startTime": times[0],
+        "endTime": times[1]
+    }, None
+
+def import_entries(rows, batch_size=IMPORT_BATCH_SIZE):
+    """Validate and save time entries in batches, one write per batch.
+
+    rows is any iterable of dicts with userId (or userName), date, startTime
+    and endTime, e.g. from read_entry_rows. Rows that fail validation or
+    break the one-entry-per-day rule or fall in a closed period are
+    skipped. Returns
+    {"imported": count, "errors": [(row number, message), ...]} with rows
+    numbered from 1.
+    """
+    directory = get_user_directory()
+
+    imported = 0
+    errors = []
+    numbered = enumerate(rows, 1)
+    while True:
+        batch = list(itertools.islice(numbered, batch_size))
+        if not batch:
+            break
+
+        valid = []
+        for number, row in batch:
+            entry_data, error = _parse_import_row(row, directory)
+            if error:
+                errors.append((number, error))
+            else:
+                valid.append((number, entry_data))
+
+        # One period resolution pass and one write for the whole batch
+        periods = assign_periods(data['date'] for _, data in valid)
+        numbers = {}
+        new_entries = []
+        for number, data in valid:
+            period = periods[data['date']]
+            entry = {
+                "id": _new_id(),
+                **data,
+                "duration": calculate_duration(data['startTime'], data['endTime']),
+                "periodId": period['id'] if period else None
+            }
+            numbers[entry['id']] = number
+            new_entries.append(entry)
+
+        storage = _storage()
+        with _entries_lock:
+            # Checked under the lock, so a period closed by another process just now counts
+            closed = get_snapshots()
+            late = [e for e in new_entries if e['periodId'] in closed]
+            for e in late:
+                errors.append((numbers[e['id']], f"period {e['periodId']} is closed"))
+            new_entries = [e for e in new_entries if e['periodId'] not in closed]
+            rejected = storage.add_entries(new_entries) if new_entries else []
+        for e in rejected:
+            errors.append((numbers[e['id']], f"an entry already exists for {e['userName']} on {e['date']}"))
+        imported += len(new_entries) - len(rejected)
+
+    errors.sort()
+    return {"imported": imported, "errors": errors}
+
+def query_entries(user_id=None, start=None, end=None, offset=0, limit=50, order="desc"):
+    """One page of entries, filtered by user and inclusive YYYY-MM-DD date range.
+
+    Entries are ordered by date then start time; order is "desc" (newest
+    first) or "asc".
+    """
+    if order not in ("asc", "desc"):
+        raise ValueError(f"order must be 'asc' or 'desc', not {order!r}")
+    return _storage().query_entries(user_id, start, end, offset, limit, order)
+
+def count_entries(user_id=None, start=None, end=None):
+    """Number of entries matching the same filters as query_entries."""
+    return _storage().count_entries(user_id, start, end)
+
+# --- Aggregates ---
+# Hours and entry counts per (periodId, userId) for open periods, kept up to
+# date by save_entry/delete_entry so Summary and Payments never rescan all
+# entries. Closed periods are read from their snapshots instead.
+_live_aggregates = (None, None)
+
+def get_aggregates():
+    """Per-period/per-user rows with hours and entry counts, for users with entries in the period."""
+    global _live_aggregates
+    storage = _storage()
+    if not storage.version("aggregates"):
+        # Never built (first run or freshly migrated data)
+        rebuild_aggregates()
+    # Rows that dropped to no entries stay stored (see _apply_deltas) but aren't shown
+    rows = storage.read("aggregates")
+    source, live = _live_aggregates
+    if source is not rows:
+        live = tuple(r for r in rows if r['entries'] > 0)
+        _live_aggregates = (rows, live)
+    return live
+
+def rebuild_aggregates():
+    """Recompute the aggregates from all entries, e.g. after editing entries.json by hand."""
+    storage = _storage()
+    # No entry write may land between the recount and the save
+    with _entries_lock:
+        closed = get_snapshots()
+        rows = [r for r in storage.compute_aggregates() if r['periodId'] not in closed]
+        storage.save("aggregates", rows)
+    return rows
+
+def get_period_totals():
+    """Aggregate rows for every period: open periods from the aggregates, closed ones from their snapshots."""
+    aggregates = get_aggregates()
+    snapshots = get_snapshots()
+    if not snapshots:
+        return aggregates
+    return tuple(aggregates) + tuple(r for s in snapshots.values() for r in s['totals'])
+
+# --- Closed periods ---
+# Closing a period freezes its hours per user into a snapshot and drops it
+# from the aggregates. Entries in a closed period can't be added or deleted
+# until it is reopened, so reads never need to recompute it.
+_snapshots = (None, None)
+
+def get_snapshots():
+    """Closed periods' snapshots. Returns {periodId: {"periodId", "closedAt", "totals"}}."""
+    global _snapshots
+    records = _storage().read("snapshots")
+    source, snapshots = _snapshots
+    if source is not records:
+        snapshots = {s['periodId']: s for s in records}
+        _snapshots = (records, snapshots)
+    return snapshots
+
+def is_period_closed(period_id):
+    return period_id in get_snapshots()
+
+def _check_moves_open(moved):
+    closed = get_snapshots()
+    for before, after in moved:
+        for period_id in (_entry_period_id(before), _entry_period_id(after)):
+            if period_id in closed:
+                raise PeriodClosedError(period_id)
+
+def _check_open(entries):
+    closed = get_snapshots()
+    for e in entries:
+        period_id = _entry_period_id(e)
+        if period_id in closed:
+            raise PeriodClosedError(period_id)
+
+def close_period(period_id):
+    """Freeze a period's totals from its entries. Returns the snapshot (the existing one if already closed)."""
+    period = get_period_calendar().get(period_id)
+    if period is None:
+        raise ValueError(f"Unknown period: {period_id}")
+
+    storage = _storage()
+    with _entries_lock:
+        # Summed from the entries themselves rather than trusting the aggregates
+        entries = storage.iter_entries(None, period['startDate'], period['endDate'], period_id)
+        snapshot = {
+            "id": period_id,
+            "periodId": period_id,
+            "closedAt": datetime.now().isoformat(),
+            "totals": _sum_by_period_user(entries)
+        }
+
+        def add(snapshots):
+            if any(s['periodId'] == period_id for s in snapshots):
+                return None
+            snapshots.append(snapshot)
+            return snapshot
+
+        if storage.update("snapshots", add) is None:
+            return get_snapshots()[period_id]
+
+        def drop(rows):
+            kept = [r for r in rows if r['periodId'] != period_id]
+            if len(kept) == len(rows):
+                return None
+            rows[:] = kept
+            return True
+
+        if storage.version("aggregates"):
+            storage.update("aggregates", drop)
+    return snapshot
+
+def reopen_period(period_id):
+    """Drop a period's snapshot so its entries can change again. Returns False if it wasn't closed."""
+    storage = _storage()
+    removed = []
+
+    def drop(snapshots):
+        removed[:] = [s for s in snapshots if s['periodId'] == period_id]
+        snapshots[:] = [s for s in snapshots if s['periodId'] != period_id]
+        return removed or None
+
+    with _entries_lock:
+        if storage.update("snapshots", drop) is None:
+            return False
+        # The entries haven't changed since the snapshot, so its totals go straight back
+        if removed[0]['totals'] and storage.version("aggregates"):
+            storage.adjust_aggregates(removed[0]['totals'])
+    return True
 
 # --- Payments ---
+PAYMENT_STATUSES = ("Pending", "Paid", "Processing", "Issue")
+
 def get_payments():
-    return _load_json(PAYMENTS_FILE)
+    return _storage().read("payments")
 
 def save_payment(period_id, user_id, status, notes):
-    payments = get_payments()
-    
-    # Check if exists
-    found = False
-    for i, p in enumerate(payments):
-        if p['periodId'] == period_id and p['userId'] == user_id:
-            payments[i].update({
-                "status": status,
-                "notes": notes,
-                "updatedAt": datetime.now().isoformat()
-            })
-            found = True
-            break
-    
-    if not found:
-        payments.append({
-            "periodId": period_id,
-            "userId": user_id,
-            "status": status,
-            "notes": notes,
-            "updatedAt": datetime.now().isoformat()
-        })
-        
-    _save_json(PAYMENTS_FILE, payments)
+    """Record a payment status. An ended period is closed once everyone with hours in it is Paid."""
+    return save_payments([(period_id, user_id, status, notes)])[0]
+
+def save_payments(changes):
+    """Record [(period_id, user_id, status, notes)] in one write, closing ended periods as save_payment does."""
+    now = datetime.now().isoformat()
+    # Merged into the existing records (if any) so extra fields are kept
+    payments = _storage().update_payments([
+        (period_id, user_id, {"status": status, "notes": notes, "updatedAt": now})
+        for period_id, user_id, status, notes in changes
+    ])
+    # A running period stays open: others may still log time in it
+    calendar = get_period_calendar()
+    today = date.today().isoformat()
+    for period_id in dict.fromkeys(c[0] for c in changes if c[2] == "Paid"):
+        period = calendar.get(period_id)
+        if period is None or period['endDate'] >= today or is_period_closed(period_id):
+            continue
+        hours = get_period_hours_by_user(period_id)
+        paid = get_payments_for_period(period_id)
+        if hours and all((paid.get(uid) or {}).get('status') == "Paid" for uid in hours):
+            close_period(period_id)
+    return payments
 
 def get_payment_status(period_id, user_id):
     payments = get_payments()
@@ -227,15 +2555,231 @@ def get_payment_status(period_id, user_id):
     return None
 
 def get_period_user_hours(period_id, user_id):
-    entries = get_entries()
-    period = next((p for p in get_periods() if p['id'] == period_id), None)
+    snapshot = get_snapshots().get(period_id)
+    if snapshot is not None:
+        return next((r['hours'] for r in snapshot['totals'] if r['userId'] == user_id), 0)
+
+    period = get_period_calendar().get(period_id)
     
     if not period:
         return 0
         
-    total = 0
-    for e in entries:
-        if e['userId'] == user_id and period['startDate'] <= e['date'] <= period['endDate']:
-            total += e['duration']
-            
-    return total
+    return _storage().sum_entry_hours(user_id, period['startDate'], period['endDate'])
+
+def get_period_hours_by_user(period_id):
+    """Total hours per user for a period from its snapshot or the aggregates. Returns {userId: hours}."""
+    snapshot = get_snapshots().get(period_id)
+    if snapshot is not None:
+        return {r['userId']: r['hours'] for r in snapshot['totals']}
+    return {r['userId']: r['hours'] for r in get_aggregates() if r['periodId'] == period_id}
+
+def get_payments_for_period(period_id):
+    """Payment records for every user in a period. Returns {userId: payment}."""
+    return _storage().payments_for_period(period_id)
+
+# --- Export ---
+def _period_in_range(period, start, end):
+    return (start is None or period['endDate'] >= start) and (end is None or period['startDate'] <= end)
+
+def export_entries(period_id=None, user_id=None, start=None, end=None):
+    """Yield matching entries as flat rows, streamed from storage in the order they were saved."""
+    calendar = get_period_calendar()
+    for e in _storage().iter_entries(user_id, start, end, period_id):
+        entry_period_id = _entry_period_id(e)
+        period = calendar.get(entry_period_id) if entry_period_id else None
+        yield {
+            "id": e['id'],
+            "userId": e['userId'],
+            "userName": e.get('userName', 'Unknown'),
+            "date": e['date'],
+            "startTime": e['startTime'],
+            "endTime": e['endTime'],
+            "duration": e['duration'],
+            "periodId": entry_period_id,
+            "periodLabel": period['label'] if period else ""
+        }
+
+def export_period_totals(period_id=None, user_id=None, start=None, end=None):
+    """Yield hours per period and user with its payment status, oldest period first.
+
+    A date range selects the periods that overlap it.
+    """
+    calendar = get_period_calendar()
+    statuses = {(p['periodId'], p['userId']): p['status'] for p in get_payments()}
+    rows = []
+    for r in get_period_totals():
+        period = calendar.get(r['periodId'])
+        if period is None or not _period_in_range(period, start, end):
+            continue
+        if (period_id is not None and r['periodId'] != period_id) or (user_id is not None and r['userId'] != user_id):
+            continue
+        rows.append((period, r))
+    rows.sort(key=lambda pr: (pr[0]['startDate'], pr[1]['userName']))
+    for period, r in rows:
+        yield {
+            "periodId": r['periodId'],
+            "periodLabel": period['label'],
+            "startDate": period['startDate'],
+            "endDate": period['endDate'],
+            "userId": r['userId'],
+            "userName": r['userName'],
+            "hours": r['hours'],
+            "entries": r['entries'],
+            "paymentStatus": statuses.get((r['periodId'], r['userId']), "Pending")
+        }
+
+def export_payments(period_id=None, user_id=None, start=None, end=None):
+    """Yield recorded payment statuses. A date range selects the periods that overlap it."""
+    calendar = get_period_calendar()
+    directory = get_user_directory()
+    for p in get_payments():
+        period = calendar.get(p['periodId'])
+        if period is not None and not _period_in_range(period, start, end):
+            continue
+        if (period_id is not None and p['periodId'] != period_id) or (user_id is not None and p['userId'] != user_id):
+            continue
+        yield {
+            "periodId": p['periodId'],
+            "periodLabel": period['label'] if period else "",
+            "userId": p['userId'],
+            "userName": (directory.get(p['userId']) or {}).get('name', 'Unknown'),
+            "status": p['status'],
+            "notes": p.get('notes', ""),
+            "updatedAt": p.get('updatedAt', "")
+        }
+
+# Export name -> (row generator, CSV columns)
+EXPORTS = {
+    "entries": (export_entries, ["id", "userId", "userName", "date", "startTime", "endTime", "duration", "periodId", "periodLabel"]),
+    "totals": (export_period_totals, ["periodId", "periodLabel", "startDate", "endDate", "userId", "userName", "hours", "entries", "paymentStatus"]),
+    "payments": (export_payments, ["periodId", "periodLabel", "userId", "userName", "status", "notes", "updatedAt"])
+}
+
+def write_export(rows, out, fmt, fields):
+    """Write rows to an open text file as CSV (with a header row) or JSONL. Returns the row count."""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    elif fmt == "jsonl":
+        for row in rows:
+            out.write(json.dumps(row) + "\n")
+            count += 1
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return count
+
+# --- Command line ---
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="TimeTracker data maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate-sqlite", help="copy data/*.json into the SQLite database")
+    migrate.add_argument("--db", default=SQLITE_FILE, help="target database file")
+    migrate.add_argument("--overwrite", action="store_true", help="replace existing rows in the database")
+
+    commands.add_parser("compact", help="fold the journal-mode entries log into entries.json")
+    commands.add_parser("rebuild-aggregates", help="recompute per-period hours from all entries")
+    commands.add_parser("merge-shards", help="write the sharded entries back to a single entries.json")
+    commands.add_parser("normalize-entries", help="store only periodId in entries saved with an embedded period")
+    rebucketer = commands.add_parser("rebucket-entries", help="reassign entries to the period their date falls in")
+    rebucketer.add_argument("--start", help="first date, YYYY-MM-DD")
+    rebucketer.add_argument("--end", help="last date, YYYY-MM-DD")
+    closer = commands.add_parser("close-period", help="freeze a period's hours so its entries can't change")
+    closer.add_argument("period", help="period id, e.g. 2025-P3")
+    reopener = commands.add_parser("reopen-period", help="drop a closed period's snapshot so its entries can change")
+    reopener.add_argument("period", help="period id, e.g. 2025-P3")
+
+    importer = commands.add_parser("import", help="bulk import time entries from a CSV or JSONL file")
+    importer.add_argument("path", help="file with userId or userName, date, startTime and endTime per row")
+    importer.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    importer.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="rows committed per write")
+
+    exporter = commands.add_parser("export", help="stream entries, period totals or payment statuses to CSV or JSONL")
+    exporter.add_argument("kind", choices=list(EXPORTS))
+    exporter.add_argument("--period", help="period id, e.g. 2025-P3")
+    exporter.add_argument("--user", help="resource id or name")
+    exporter.add_argument("--start", help="first date, YYYY-MM-DD")
+    exporter.add_argument("--end", help="last date, YYYY-MM-DD")
+    exporter.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    exporter.add_argument("--output", help="file to write; defaults to stdout")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate-sqlite":
+        counts = migrate_json_to_sqlite(args.db, overwrite=args.overwrite)
+        for dataset, count in counts.items():
+            print(f"{dataset}: {count} records")
+        print(f"Set TIMETRACKER_STORAGE=sqlite to use {args.db}")
+    elif args.command == "compact":
+        JournalStorage().compact()
+        print(f"Compacted {ENTRIES_LOG_FILE} into {ENTRIES_FILE}")
+    elif args.command == "rebuild-aggregates":
+        rows = rebuild_aggregates()
+        print(f"Rebuilt {len(rows)} period/user aggregates")
+    elif args.command == "merge-shards":
+        entries = ShardedStorage().load("entries")
+        JsonStorage().save("entries", entries)
+        print(f"Wrote {len(entries)} entries to {ENTRIES_FILE}")
+    elif args.command == "normalize-entries":
+        print(f"Normalized {normalize_entries()} entries")
+    elif args.command == "rebucket-entries":
+        print(f"Moved {rebucket_entries(args.start, args.end)} entries")
+    elif args.command == "close-period":
+        if get_period_calendar().get(args.period) is None:
+            parser.error(f"unknown period: {args.period}")
+        snapshot = close_period(args.period)
+        print(f"Closed {args.period}: {sum(r['hours'] for r in snapshot['totals']):.2f}h for {len(snapshot['totals'])} resources")
+    elif args.command == "reopen-period":
+        if not reopen_period(args.period):
+            print(f"{args.period} is not closed", file=sys.stderr)
+            return 1
+        print(f"Reopened {args.period}")
+    elif args.command == "import":
+        report = import_entries(read_entry_rows(args.path, args.format), batch_size=args.batch_size)
+        for number, error in report['errors']:
+            print(f"row {number}: {error}", file=sys.stderr)
+        print(f"Imported {report['imported']} entries, {len(report['errors'])} rows rejected")
+        return 1 if report['errors'] else 0
+    elif args.command == "export":
+        user_id = None
+        if args.user:
+            directory = get_user_directory()
+            user = directory.get(args.user) or directory.by_name(args.user)
+            if user is None:
+                parser.error(f"unknown resource: {args.user}")
+            user_id = user['id']
+        export, fields = EXPORTS[args.kind]
+        rows = export(period_id=args.period, user_id=user_id, start=args.start, end=args.end)
+        if args.output:
+            with open(args.output, 'w', newline='') as out:
+                count = write_export(rows, out, args.format, fields)
+        else:
+            count = write_export(rows, sys.stdout, args.format, fields)
+        print(f"Exported {count} {args.kind} rows", file=sys.stderr)
+    return 0
+
+# --- Instrumentation ---
+# With TIMETRACKER_METRICS=1 every public function, plus file I/O and
+# (de)serialization, is wrapped to record calls, time and bytes.
+if metrics.ENABLED:
+    metrics.instrument(
+        sys.modules[__name__],
+        [name for name, obj in list(globals().items())
+         if inspect.isfunction(obj) and obj.__module__ == __name__ and not name.startswith("_") and name != "main"]
+        + ["_load_json", "_save_json", "_encode", "_decode"],
+        bytes_of={
+            "_load_json": metrics.file_size,
+            "_save_json": metrics.file_size,
+            "_encode": metrics.payload_size,
+            "_decode": metrics.argument_size
+        }
+    )
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""Opt-in timing and I/O counters for data_manager.
+
+Enabled with TIMETRACKER_METRICS=1. Every public data_manager function,
+plus the file load/save and encode/decode helpers, then records its call
+count, time and bytes read or written. Calls are grouped per Streamlit
+rerun (see run()) and summed per page. The totals are written to a
+Prometheus text file (TIMETRACKER_METRICS_FILE) that monitoring can scrape.
+"""
+import atexit
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("TIMETRACKER_METRICS", "") not in ("", "0")
+METRICS_FILE = os.environ.get("TIMETRACKER_METRICS_FILE", os.path.join("data", "metrics.prom"))
+
+# Minimum seconds between rewrites of METRICS_FILE
+WRITE_INTERVAL = 10
+
+# Page label for calls made outside run(), e.g. background threads and the CLI
+BACKGROUND = "-"
+
+_local = threading.local()
+_lock = threading.Lock()
+# (page, function) -> [calls, seconds, bytes]
+_totals = {}
+# page -> [runs, seconds, data_manager seconds]
+_pages = {}
+_last_write = 0.0
+
+
+def _add(table, key, calls, seconds, nbytes):
+    row = table.get(key)
+    if row is None:
+        row = table[key] = [0, 0.0, 0]
+    row[0] += calls
+    row[1] += seconds
+    row[2] += nbytes
+
+
+def _record(name, seconds, nbytes, outermost):
+    calls = getattr(_local, "calls", None)
+    if calls is None:
+        with _lock:
+            _add(_totals, (BACKGROUND, name), 1, seconds, nbytes)
+        return
+    _add(calls, name, 1, seconds, nbytes)
+    if outermost:
+        _local.data_seconds += seconds
+
+
+def timed(name, func, bytes_of=None):
+    """Wrap func so each call is recorded under name.
+
+    bytes_of(args, result) gives the bytes read or written by the call.
+    Times include nested instrumented calls.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        start = time.perf_counter()
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            _local.depth = depth
+            nbytes = bytes_of(args, result) if bytes_of else 0
+            _record(name, time.perf_counter() - start, nbytes, depth == 0)
+    return wrapper
+
+
+def instrument(module, names, bytes_of=None):
+    """Replace the named module functions with timed wrappers. Generators are left alone."""
+    bytes_of = bytes_of or {}
+    for name in names:
+        func = getattr(module, name)
+        if inspect.isgeneratorfunction(func) or getattr(func, "__wrapped__", None):
+            continue
+        setattr(module, name, timed(name, func, bytes_of.get(name)))
+
+
+def file_size(args, result):
+    """bytes_of helper for functions whose first argument is a file path."""
+    try:
+        return os.path.getsize(args[0])
+    except (OSError, IndexError, TypeError):
+        return 0
+
+
+def payload_size(args, result):
+    """bytes_of helper for functions that return the encoded bytes."""
+    return len(result) if isinstance(result, (bytes, bytearray)) else 0
+
+
+def argument_size(args, result):
+    """bytes_of helper for functions that take the bytes to decode."""
+    return len(args[0]) if args and isinstance(args[0], (bytes, bytearray)) else 0
+
+
+@contextmanager
+def run(page):
+    """Collect the instrumented calls made in this thread while rendering page.
+
+    Yields {function: [calls, seconds, bytes]} for this run; afterwards the
+    run is added to the per-page totals and available from last_run().
+    """
+    if not ENABLED:
+        yield {}
+        return
+    calls = {}
+    _local.calls = calls
+    _local.data_seconds = 0.0
+    start = time.perf_counter()
+    try:
+        yield calls
+    finally:
+        seconds = time.perf_counter() - start
+        _local.calls = None
+        _local.last_run = {"page": page, "seconds": seconds, "data_seconds": _local.data_seconds, "calls": calls}
+        with _lock:
+            for name, (count, spent, nbytes) in calls.items():
+                _add(_totals, (page, name), count, spent, nbytes)
+            _add(_pages, page, 1, seconds, _local.data_seconds)
+        write_prometheus()
+
+
+def last_run():
+    """The most recent run() in this thread, or None."""
+    return getattr(_local, "last_run", None)
+
+
+def page_totals():
+    """{page: {"runs", "seconds", "data_seconds"}} since the process started."""
+    with _lock:
+        return {page: {"runs": r, "seconds": s, "data_seconds": d} for page, (r, s, d) in _pages.items()}
+
+
+def function_totals(page=None):
+    """{(page, function): {"calls", "seconds", "bytes"}} since the process started."""
+    with _lock:
+        return {
+            key: {"calls": c, "seconds": s, "bytes": b}
+            for key, (c, s, b) in _totals.items() if page is None or key[0] == page
+        }
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def prometheus_text():
+    """All totals in the Prometheus text exposition format."""
+    with _lock:
+        totals = sorted(_totals.items())
+        pages = sorted(_pages.items())
+
+    lines = []
+    for metric, index, help_text in (
+        ("timetracker_data_calls_total", 0, "Calls to data_manager functions."),
+        ("timetracker_data_seconds_total", 1, "Time spent in data_manager functions, including nested calls."),
+        ("timetracker_data_bytes_total", 2, "Bytes read or written by data_manager functions."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for (page, name), row in totals:
+            if index == 2 and not row[2]:
+                continue
+            lines.append(f'{metric}{{page="{_label(page)}",function="{_label(name)}"}} {row[index]}')
+    for metric, index, help_text in (
+        ("timetracker_page_runs_total", 0, "Streamlit reruns per page."),
+        ("timetracker_page_seconds_total", 1, "Time spent rendering each page."),
+        ("timetracker_page_data_seconds_total", 2, "Part of the page time spent in data_manager."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for page, row in pages:
+            lines.append(f'{metric}{{page="{_label(page)}"}} {row[index]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(force=False):
+    """Rewrite METRICS_FILE, at most once every WRITE_INTERVAL seconds unless forced."""
+    global _last_write
+    now = time.monotonic()
+    with _lock:
+        if not force and now - _last_write < WRITE_INTERVAL:
+            return
+        _last_write = now
+    directory = os.path.dirname(METRICS_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write then rename so a scrape never sees half a file
+    tmp_path = f"{METRICS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, METRICS_FILE)
+
+
+if ENABLED:
+    # Don't lose the calls since the last interval when the process stops
+    atexit.register(write_prometheus, True)
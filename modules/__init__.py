@@ -1 +1,16 @@
 """Pages package for TimeTracker application."""
+import importlib
+
+# Navigation name -> page module. Pages are imported the first time they
+# are opened, so the login screen doesn't wait for pandas or other pages.
+PAGES = {
+    "Time Entry": "time_entry",
+    "Summary": "summary",
+    "Resource Management": "resources",
+    "Payments": "payments",
+    "Periods": "periods",
+}
+
+def load(page):
+    """Return the module for a page, importing it on first use."""
+    return importlib.import_module(f"{__name__}.{PAGES[page]}")
@@ -1,22 +1,33 @@
 """Payments page for the TimeTracker application."""
 import streamlit as st
+import analytics
 import data_manager as dm
 
 def render():
     """Render the Payments page."""
     st.subheader("Payment Tracking")
     
-    periods = dm.get_periods()
     # Sort periods desc
-    periods.sort(key=lambda x: (x['year'], x['periodNum']), reverse=True)
+    periods = sorted(dm.get_periods(), key=lambda x: (x['year'], x['periodNum']), reverse=True)
     
     period_options = {p['label']: p['id'] for p in periods}
     selected_period_label = st.selectbox("Select Period", list(period_options.keys()))
     selected_period_id = period_options[selected_period_label]
     
     st.markdown(f"**{selected_period_label}**")
+    if dm.is_period_closed(selected_period_id):
+        st.caption("🔒 Closed: hours are frozen from the period's snapshot.")
+    
+    # Totals per role for the selected period
+    role_totals = analytics.role_rollup(selected_period_id)
+    if not role_totals.empty:
+        st.caption(" · ".join(
+            f"{r.role}: {r.hours:.2f}h ({r.resources} resources)" for r in role_totals.itertuples(index=False)
+        ))
     
     users = dm.get_users()
+    period_hours = dm.get_period_hours_by_user(selected_period_id)
+    period_payments = dm.get_payments_for_period(selected_period_id)
     
     # Header
     c1, c2, c3, c4, c5, c6 = st.columns([2, 1.5, 1.5, 2, 3, 1])
@@ -30,8 +41,8 @@ def render():
     for user in users:
         c1, c2, c3, c4, c5, c6 = st.columns([2, 1.5, 1.5, 2, 3, 1])
         
-        hours = dm.get_period_user_hours(selected_period_id, user['id'])
-        payment = dm.get_payment_status(selected_period_id, user['id'])
+        hours = period_hours.get(user['id'], 0)
+        payment = period_payments.get(user['id'])
         
         status = payment['status'] if payment else "Pending"
         notes = payment['notes'] if payment else ""
@@ -41,8 +52,8 @@ def render():
         c3.write(f"{hours:.2f}")
         
         # Unique keys for inputs
-        new_status = c4.selectbox("Status", ["Pending", "Paid", "Processing", "Issue"], 
-                                  index=["Pending", "Paid", "Processing", "Issue"].index(status),
+        new_status = c4.selectbox("Status", dm.PAYMENT_STATUSES, 
+                                  index=dm.PAYMENT_STATUSES.index(status),
                                   key=f"status_{user['id']}", label_visibility="collapsed")
         
         new_notes = c5.text_input("Notes", value=notes, key=f"notes_{user['id']}", label_visibility="collapsed")
@@ -7,17 +7,35 @@ def render():
     """Render the Periods page."""
     st.subheader("Manage Periods")
     
-    periods = dm.get_periods()
-    periods.sort(key=lambda x: (x['year'], x['periodNum']), reverse=True)
+    periods = sorted(dm.get_periods(), key=lambda x: (x['year'], x['periodNum']), reverse=True)
+    
+    snapshots = dm.get_snapshots()
     
     for p in periods:
-        with st.expander(p['label']):
+        snapshot = snapshots.get(p['id'])
+        label = f"🔒 {p['label']}" if snapshot else p['label']
+        with st.expander(label):
             with st.form(f"period_form_{p['id']}"):
                 c1, c2 = st.columns(2)
-                new_start = c1.date_input("Start Date", datetime.strptime(p['startDate'], '%Y-%m-%d'))
-                new_end = c2.date_input("End Date", datetime.strptime(p['endDate'], '%Y-%m-%d'))
+                new_start = c1.date_input("Start Date", datetime.strptime(p['startDate'], '%Y-%m-%d'), disabled=bool(snapshot))
+                new_end = c2.date_input("End Date", datetime.strptime(p['endDate'], '%Y-%m-%d'), disabled=bool(snapshot))
                 
-                if st.form_submit_button("Update"):
-                    dm.update_period(p['id'], new_start.strftime('%Y-%m-%d'), new_end.strftime('%Y-%m-%d'))
-                    st.success("Period updated")
+                if st.form_submit_button("Update", disabled=bool(snapshot)):
+                    try:
+                        dm.update_period(p['id'], new_start.strftime('%Y-%m-%d'), new_end.strftime('%Y-%m-%d'))
+                    except dm.PeriodClosedError as e:
+                        st.error(f"🔒 The new dates reach into closed period {e.period_id}. Reopen it first.")
+                    else:
+                        st.success("Period updated")
+                        st.rerun()
+            
+            # Closing freezes the period's hours; entries in it can't change until reopened
+            if snapshot:
+                hours = sum(r['hours'] for r in snapshot['totals'])
+                st.caption(f"Closed {snapshot['closedAt'][:16].replace('T', ' ')} · {hours:.2f}h frozen")
+                if st.button("Reopen", key=f"reopen_{p['id']}"):
+                    dm.reopen_period(p['id'])
                     st.rerun()
+            elif st.button("Close period", key=f"close_{p['id']}"):
+                dm.close_period(p['id'])
+                st.rerun()
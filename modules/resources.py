@@ -77,7 +77,7 @@ def render():
                         
                         edit_password = st.text_input("New Password", type="password", placeholder="Leave blank to keep unchanged", key=f"edit_pass_{u['id']}")
                         
-                        current_apps = u.get('assigned_apps', ["Time Entry", "Summary", "Resource Management", "Payments", "Periods"])
+                        current_apps = list(u.get('assigned_apps', ["Time Entry", "Summary", "Resource Management", "Payments", "Periods"]))
                         edit_apps = st.multiselect("Assigned Apps", 
                                                  ["Time Entry", "Summary", "Resource Management", "Payments", "Periods"],
                                                  default=current_apps,
@@ -1,6 +1,45 @@
 """Summary page for the TimeTracker application."""
 import streamlit as st
-import data_manager as dm
+import analytics
+
+# Periods shown at first and added by each "load older" click
+SUMMARY_PAGE_SIZE = 6
+
+@st.cache_data(max_entries=2000, show_spinner=False)
+def _period_card(label, num, users):
+    """HTML for one period's card. users is a tuple of (name, period hours, cumulative hours).
+
+    Cached on its arguments, so a card is only rebuilt when that period's
+    totals (or its cumulative hours) change.
+    """
+    html_content = f"""
+<div class="summary-card">
+<div class="card-header">
+<div class="period-label">{label}</div>
+<div class="period-badge">Period {num}</div>
+</div>
+"""
+    
+    for name, total, cumulative in users:
+        initials = "".join([n[0] for n in name.split()[:2]]).upper()
+        html_content += f"""
+<div class="user-row">
+<div class="user-name">
+<div class="user-avatar">{initials}</div>
+{name}
+</div>
+<div class="stat-col">
+<span class="stat-value">{total:.2f}h</span>
+<span class="stat-label">Period</span>
+</div>
+<div class="stat-col">
+<span class="stat-value">{cumulative:.2f}h</span>
+<span class="stat-label">Cumulative</span>
+</div>
+</div>
+"""
+    
+    return html_content + "</div>"
 
 def render():
     """Render the Summary page."""
@@ -138,79 +177,25 @@ def render():
 
     st.markdown("## **Bi-Weekly Summary**")
     
-    entries = dm.get_entries()
+    sorted_summary = analytics.period_summary()
     
-    if not entries:
+    if not sorted_summary:
         st.info("No data to summarize.")
         return
-    
-    # Aggregate by period and user
-    summary_data = {}
-    for e in entries:
-        if not e.get('period'):
-            continue
-        pid = e['period']['id']
-        uid = e['userId']
-
-        if pid not in summary_data:
-            summary_data[pid] = {
-                "label": e['period']['label'],
-                "year": e['period']['year'],
-                "num": e['period']['periodNum'],
-                "users": {}
-            }
 
-        if uid not in summary_data[pid]['users']:
-            summary_data[pid]['users'][uid] = {
-                "name": e.get('userName', 'Unknown'),
-                "total": 0
-            }
-
-        summary_data[pid]['users'][uid]['total'] += e['duration']
-
-    # Sort periods (reverse chronologically)
-    sorted_summary = sorted(summary_data.values(), key=lambda x: (x['year'], x['num']), reverse=True)
-
-    # Calculate cumulative totals
-    user_cumulatives = {}
-    for item in reversed(sorted_summary):  # earliest → latest
-        for uid, user_data in item['users'].items():
-            user_cumulatives[uid] = user_cumulatives.get(uid, 0) + user_data['total']
-            user_data['cumulative'] = user_cumulatives[uid]
-
-    # Generate HTML
-    html_content = '<div class="summary-container">'
-    
-    for item in sorted_summary:
-        html_content += f"""
-<div class="summary-card">
-<div class="card-header">
-<div class="period-label">{item['label']}</div>
-<div class="period-badge">Period {item['num']}</div>
-</div>
-"""
-        
-        for uid, user_data in item['users'].items():
-            initials = "".join([n[0] for n in user_data['name'].split()[:2]]).upper()
-            html_content += f"""
-<div class="user-row">
-<div class="user-name">
-<div class="user-avatar">{initials}</div>
-{user_data['name']}
-</div>
-<div class="stat-col">
-<span class="stat-value">{user_data['total']:.2f}h</span>
-<span class="stat-label">Period</span>
-</div>
-<div class="stat-col">
-<span class="stat-value">{user_data['cumulative']:.2f}h</span>
-<span class="stat-label">Cumulative</span>
-</div>
-</div>
-"""
-            
-        html_content += "</div>"
-        
-    html_content += "</div>"
+    # Latest periods first; older ones are added on request
+    shown = st.session_state.get("summary_periods_shown", SUMMARY_PAGE_SIZE)
+    cards = [
+        _period_card(
+            item['label'], item['num'],
+            tuple((u['name'], u['total'], u['cumulative']) for u in item['users'].values())
+        )
+        for item in sorted_summary[:shown]
+    ]
+    st.markdown('<div class="summary-container">' + "".join(cards) + "</div>", unsafe_allow_html=True)
     
-    st.markdown(html_content, unsafe_allow_html=True)
+    older = len(sorted_summary) - shown
+    if older > 0:
+        if st.button(f"Load older periods ({older} more)", key="summary_load_older"):
+            st.session_state.summary_periods_shown = shown + SUMMARY_PAGE_SIZE
+            st.rerun()
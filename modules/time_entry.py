@@ -1,9 +1,10 @@
 """Time Entry page for the TimeTracker application."""
 import streamlit as st
-import pandas as pd
 from datetime import datetime, date
 import data_manager as dm
 
+ENTRIES_PAGE_SIZE = 25
+
 def render():
     
     """Render the Time Entry page."""
@@ -26,8 +27,8 @@ def render():
         with st.container(border=True):
             st.markdown("### Add New Entry")
             with st.form("entry_form"):
-                users = dm.get_users()
-                active_users = [u for u in users if u['active']]
+                directory = dm.get_user_directory()
+                active_users = directory.active
                 user_names = [u['name'] for u in active_users]
                 
                 # Default to logged-in user if available
@@ -43,28 +44,25 @@ def render():
                 submitted = st.form_submit_button("Log Time", use_container_width=True)
                 
                 if submitted and selected_user_name != "No resources found":
-                    selected_user = next(u for u in active_users if u['name'] == selected_user_name)
+                    selected_user = directory.by_name(selected_user_name, active=True)
                     
-                    # Check if entry already exists for this resource on this date
-                    existing_entries = dm.get_entries()
                     date_str = entry_date.strftime("%Y-%m-%d")
-                    duplicate = any(
-                        e['userId'] == selected_user['id'] and e['date'] == date_str 
-                        for e in existing_entries
-                    )
+                    entry_data = {
+                        "userId": selected_user['id'],
+                        "userName": selected_user['name'],
+                        "date": date_str,
+                        "startTime": start_time.strftime("%H:%M"),
+                        "endTime": end_time.strftime("%H:%M")
+                    }
                     
-                    if duplicate:
+                    # Only one entry per resource per day; enforced by data_manager
+                    try:
+                        dm.save_entry(entry_data)
+                    except dm.DuplicateEntryError:
                         st.error(f"⚠️ An entry already exists for {selected_user['name']} on {date_str}. Only one entry per resource per day is allowed.")
+                    except dm.PeriodClosedError as e:
+                        st.error(f"🔒 Period {e.period_id} is closed. Reopen it on the Periods page to add entries.")
                     else:
-                        entry_data = {
-                            "userId": selected_user['id'],
-                            "userName": selected_user['name'],
-                            "date": date_str,
-                            "startTime": start_time.strftime("%H:%M"),
-                            "endTime": end_time.strftime("%H:%M")
-                        }
-                        
-                        dm.save_entry(entry_data)
                         st.success("Entry saved!")
                         st.rerun()
 
@@ -73,23 +71,38 @@ def render():
             st.markdown("### Recent Entries")
             
             # Resource filter for entries
-            users = dm.get_users()
-            all_users = [u for u in users if u['active']]
-            user_filter_options = ["All Resources"] + [u['name'] for u in all_users]
+            user_filter_options = ["All Resources"] + [u['name'] for u in directory.active]
             selected_filter = st.selectbox("Filter by Resource", user_filter_options, key="entry_filter")
-            
-            entries = dm.get_entries()
+            date_range = st.date_input("Filter by Date", value=(), key="entry_date_filter")
             
             # Apply resource filter
+            selected_user_id = None
             if selected_filter != "All Resources":
-                selected_user_id = next((u['id'] for u in all_users if u['name'] == selected_filter), None)
-                if selected_user_id:
-                    entries = [e for e in entries if e['userId'] == selected_user_id]
+                selected_user = directory.by_name(selected_filter, active=True)
+                selected_user_id = selected_user['id'] if selected_user else None
+            
+            # Apply date filter once both ends of the range are picked
+            start_str = end_str = None
+            if len(date_range) == 2:
+                start_str, end_str = (d.strftime("%Y-%m-%d") for d in date_range)
+            
+            # Go back to the first page whenever the filters change
+            filters = (selected_user_id, start_str, end_str)
+            if st.session_state.get("entries_filters") != filters:
+                st.session_state.entries_filters = filters
+                st.session_state.entries_page = 0
+            
+            total = dm.count_entries(selected_user_id, start_str, end_str)
+            page_count = max(1, -(-total // ENTRIES_PAGE_SIZE))
+            page = min(st.session_state.get("entries_page", 0), page_count - 1)
+            
+            # Newest first: date desc, then start time desc
+            entries = dm.query_entries(
+                selected_user_id, start_str, end_str,
+                offset=page * ENTRIES_PAGE_SIZE, limit=ENTRIES_PAGE_SIZE, order="desc"
+            )
             
             if entries:
-                # Sort by date desc, then start time desc
-                entries.sort(key=lambda x: (x['date'], x['startTime']), reverse=True)
-                
                 # Display entries
                 # Header row
                 c1, c2, c3, c4, c5, c6 = st.columns([2, 2, 3, 2, 1, 1])
@@ -101,7 +114,8 @@ def render():
                 c6.markdown("**Del**")
                 
                 for e in entries:
-                    period_label = e['period']['label'] if e.get('period') else "Unknown"
+                    period = dm.get_entry_period(e)
+                    period_label = period['label'] if period else "Unknown"
                     c1, c2, c3, c4, c5, c6 = st.columns([2, 2, 3, 2, 1, 1])
                     c1.write(e['date'])
                     c2.write(e.get('userName', 'Unknown'))
@@ -109,7 +123,21 @@ def render():
                     c4.write(f"{e['startTime']} - {e['endTime']}")
                     c5.write(f"{e['duration']}h")
                     if c6.button("🗑️", key=f"del_{e['id']}"):
-                        dm.delete_entry(e['id'])
-                        st.rerun()
+                        try:
+                            dm.delete_entry(e['id'])
+                        except dm.PeriodClosedError as err:
+                            st.error(f"🔒 Period {err.period_id} is closed. Reopen it on the Periods page to delete entries.")
+                        else:
+                            st.rerun()
+                
+                # Paging controls
+                p1, p2, p3 = st.columns([1, 2, 1])
+                if p1.button("◀ Newer", key="entries_prev", disabled=page == 0):
+                    st.session_state.entries_page = page - 1
+                    st.rerun()
+                p2.caption(f"Page {page + 1} of {page_count} · {total} entries")
+                if p3.button("Older ▶", key="entries_next", disabled=page >= page_count - 1):
+                    st.session_state.entries_page = page + 1
+                    st.rerun()
             else:
                 st.info("No entries yet.")
@@ -10,8 +10,8 @@ def render():
     with st.form("login_form"):
         st.markdown("**Please select your name to continue**")
         
-        users = dm.get_users()
-        active_users = [u for u in users if u['active']]
+        directory = dm.get_user_directory()
+        active_users = directory.active
         
         if not active_users:
             st.error("No active resources found. Please contact your administrator.")
@@ -25,7 +25,7 @@ def render():
         submitted = st.form_submit_button("Login")
         
         if submitted:
-            selected_user = next(u for u in active_users if u['name'] == selected_name)
+            selected_user = directory.by_name(selected_name, active=True)
             
             # Check password
             stored_password = selected_user.get('password', "")
@@ -37,5 +37,5 @@ def render():
             st.session_state.user_id = selected_user['id']
             st.session_state.full_name = selected_user['name']
             st.session_state.role = selected_user['role']
-            st.session_state.assigned_apps = selected_user.get('assigned_apps', ["Time Entry", "Summary", "Resource Management", "Payments", "Periods"])
+            st.session_state.assigned_apps = list(selected_user.get('assigned_apps', ["Time Entry", "Summary", "Resource Management", "Payments", "Periods"]))
             st.rerun()
@@ -0,0 +1,229 @@
+"""Several processes writing to one data directory at once.
+
+data_manager picks its backend and data directory when imported, so each
+test runs this file as a script in a fresh directory; the script starts
+the writer processes and checks the result.
+
+    python -m pytest tests
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import Process, Queue
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACKENDS = ["json", "journal", "sharded", "sqlite"]
+
+PROCESSES = 4
+THREADS = 3
+DAYS = 12
+USERS = 15
+
+
+def run_scenario(name, tmp_path, backend, write_behind, **env):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), name],
+        cwd=tmp_path,
+        env={
+            **os.environ,
+            "PYTHONPATH": ROOT,
+            "TIMETRACKER_STORAGE": backend,
+            "TIMETRACKER_WRITE_BEHIND": "1" if write_behind else "0",
+            # The checking process must see the workers' writes straight away
+            "TIMETRACKER_CACHE_CHECK_INTERVAL": "0",
+            **env
+        },
+        capture_output=True,
+        text=True,
+        timeout=300
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+@pytest.mark.parametrize("write_behind", [False, True], ids=["direct", "write-behind"])
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_aggregates_match_entries(tmp_path, backend, write_behind):
+    # A tiny compaction threshold makes the journal compact while others append
+    run_scenario("aggregates", tmp_path, backend, write_behind, TIMETRACKER_JOURNAL_COMPACT_BYTES="2048")
+
+
+@pytest.mark.parametrize("write_behind", [False, True], ids=["direct", "write-behind"])
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_snapshot_matches_stored_entries(tmp_path, backend, write_behind):
+    run_scenario("close", tmp_path, backend, write_behind)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_updates_are_not_lost(tmp_path, backend):
+    run_scenario("users", tmp_path, backend, False)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_queued_entries_are_read_back(tmp_path, backend):
+    run_scenario("queued", tmp_path, backend, True)
+
+
+# --- Scenarios (run in the data directory by run_scenario) ---
+def _save_entries(worker, period_id, results):
+    import data_manager as dm
+
+    period = dm.get_period_calendar().get(period_id)
+    start = dm.date.fromisoformat(period['startDate'])
+    saved, errors = [], []
+
+    def save(thread):
+        for day in range(DAYS):
+            entry = {
+                "userId": f"u{worker}-{thread}",
+                "userName": f"User {worker}-{thread}",
+                "date": (start + dm.timedelta(days=day)).isoformat(),
+                "startTime": "09:00",
+                "endTime": "10:30"
+            }
+            try:
+                saved.append(dm.save_entry(entry)['id'])
+            except dm.PeriodClosedError:
+                pass
+            except Exception as e:
+                errors.append(repr(e))
+            # Every few saves one is taken back again
+            if day % 5 == 4 and saved:
+                try:
+                    dm.delete_entry(saved[-1])
+                    saved.pop()
+                except dm.PeriodClosedError:
+                    pass
+
+    threads = [threading.Thread(target=save, args=(t,)) for t in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    dm.flush()
+    results.put((len(saved), errors))
+
+
+def _rows(rows):
+    return sorted((r['periodId'], r['userId'], r['hours'], r['entries']) for r in rows)
+
+
+def _start_workers(target, *args):
+    results = Queue()
+    workers = [Process(target=target, args=(k, *args, results)) for k in range(PROCESSES)]
+    for p in workers:
+        p.start()
+    return workers, results
+
+
+def _finish_workers(workers, results):
+    outcome = [results.get(timeout=240) for _ in workers]
+    for p in workers:
+        p.join()
+    return outcome
+
+
+def scenario_aggregates():
+    import data_manager as dm
+
+    dm.ensure_period_years([2025])
+    # Built first, so every save has to keep them up to date
+    dm.get_aggregates()
+    workers, results = _start_workers(_save_entries, "2025-P5")
+    outcome = _finish_workers(workers, results)
+
+    errors = [e for _, worker_errors in outcome for e in worker_errors]
+    assert not errors, errors
+    assert dm.count_entries() == sum(saved for saved, _ in outcome)
+    assert _rows(dm.get_aggregates()) == _rows(dm._storage().compute_aggregates())
+
+
+def _close_when_started(period_id, entries):
+    import data_manager as dm
+
+    while dm.count_entries() < entries:
+        time.sleep(0.005)
+    dm.close_period(period_id)
+
+
+def scenario_close():
+    import data_manager as dm
+
+    dm.ensure_period_years([2025])
+    dm.get_aggregates()
+    workers, results = _start_workers(_save_entries, "2025-P5")
+    closer = Process(target=_close_when_started, args=("2025-P5", PROCESSES * THREADS))
+    closer.start()
+    outcome = _finish_workers(workers, results)
+    closer.join()
+
+    period = dm.get_period_calendar().get("2025-P5")
+    stored = dm.query_entries(start=period['startDate'], end=period['endDate'], limit=sys.maxsize)
+    snapshot = dm.get_snapshots()["2025-P5"]
+    assert _rows(snapshot['totals']) == _rows(dm._sum_by_period_user(stored))
+    if not dm.WRITE_BEHIND:
+        # Queued entries for a closed period are dropped at commit instead
+        assert len(stored) == sum(saved for saved, _ in outcome)
+
+    # Reopening puts the frozen totals back into the aggregates
+    dm.reopen_period("2025-P5")
+    assert _rows(dm.get_aggregates()) == _rows(dm._storage().compute_aggregates())
+
+
+def _save_users(worker, results):
+    import data_manager as dm
+
+    errors = []
+
+    def save(thread):
+        for i in range(USERS):
+            try:
+                dm.save_user(f"User {worker}-{thread}-{i}", "PA")
+            except Exception as e:
+                errors.append(repr(e))
+
+    threads = [threading.Thread(target=save, args=(t,)) for t in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put(errors)
+
+
+def scenario_users():
+    import data_manager as dm
+
+    workers, results = _start_workers(_save_users)
+    errors = [e for worker_errors in _finish_workers(workers, results) for e in worker_errors]
+    assert not errors, errors
+
+    names = [u['name'] for u in dm.get_users()]
+    # Seeding an empty directory through save_user still creates the Admin login
+    assert names.count("Admin") == 1
+    assert len(names) == 1 + PROCESSES * THREADS * USERS
+
+
+def scenario_queued():
+    import data_manager as dm
+
+    # Nothing committed yet, so the aggregates have no rows to add to
+    dm.get_aggregates()
+    entry = dm.save_entry({"userId": "u1", "userName": "User 1", "date": "2025-03-03", "startTime": "09:00", "endTime": "10:30"})
+    assert dm.get_period_hours_by_user(entry['periodId']) == {"u1": 1.5}
+    assert dm.count_entries() == 1
+    assert dm.flush()
+
+
+SCENARIOS = {
+    "aggregates": scenario_aggregates,
+    "close": scenario_close,
+    "users": scenario_users,
+    "queued": scenario_queued,
+}
+
+if __name__ == "__main__":
+    SCENARIOS[sys.argv[1]]()